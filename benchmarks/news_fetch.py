@@ -0,0 +1,153 @@
+"""Compare sequential urllib news fetches against the pooled concurrent fetcher.
+
+A local HTTP server stands in for Google News, adding a fixed latency to every
+response so the numbers reflect waiting on the network rather than parsing.
+Run from the project root:
+
+    uv run python -m benchmarks.news_fetch --queries 8 --latency-ms 300
+"""
+
+import argparse
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wsbreporter import config
+from wsbreporter import news
+
+
+def rss_body(query: str, items: int) -> bytes:
+    entries = "".join(f"""
+        <item>
+          <title>{query} headline {i}</title>
+          <link>https://example.com/{query}/{i}</link>
+          <pubDate>Mon, 06 Oct 2025 14:00:00 GMT</pubDate>
+          <description>Summary {i} for {query}</description>
+          <source url="https://example.com">Example Wire</source>
+        </item>""" for i in range(items))
+    return f'<?xml version="1.0"?><rss><channel>{entries}</channel></rss>'.encode()
+
+
+def start_server(latency: float, stall: float, items: int):
+    stats = {"connections": 0, "requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with lock:
+                stats["connections"] += 1
+
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+            params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            query = params.get("q", [""])[0]
+            time.sleep(stall if query == "STALL" else latency)
+            body = rss_body(query, items)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def bench_sequential_urllib(base_url: str, queries: list[str]) -> float:
+    # The old fetcher: one query at a time, a new connection for each.
+    started = time.perf_counter()
+    for query in queries:
+        url = f"{base_url}?{urllib.parse.urlencode({'q': query})}"
+        with urllib.request.urlopen(url, timeout=15) as response:
+            response.read()
+    return time.perf_counter() - started
+
+
+def bench_pooled(queries: list[str], workers: int) -> tuple[float, int]:
+    config.NEWS_FETCH_WORKERS = workers
+    news._http_session = None
+    started = time.perf_counter()
+    fetched = news.get_news_provider("google-news-rss").fetch(queries)
+    return time.perf_counter() - started, len(fetched)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--stall-ms",
+        type=float,
+        default=0,
+        help="Add one query whose response takes this long (tests the deadline)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=2,
+        help="News stage deadline for the stalled run, in seconds",
+    )
+    args = parser.parse_args()
+
+    server, stats = start_server(
+        args.latency_ms / 1000, args.stall_ms / 1000, args.items
+    )
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/rss/search"
+    news.GOOGLE_NEWS_RSS_URL = base_url
+    queries = [f"TICKER{i}" for i in range(args.queries)]
+
+    sequential = bench_sequential_urllib(base_url, queries)
+    sequential_connections = stats["connections"]
+
+    stats["connections"] = 0
+    pooled_one, _ = bench_pooled(queries, 1)
+    pooled_one_connections = stats["connections"]
+
+    stats["connections"] = 0
+    pooled, _ = bench_pooled(queries, args.workers)
+    pooled_connections = stats["connections"]
+
+    stalled = None
+    if args.stall_ms:
+        config.NEWS_FETCH_DEADLINE_SECONDS = args.deadline
+        stalled, fetched = bench_pooled(queries + ["STALL"], args.workers)
+
+    server.shutdown()
+
+    print(f"queries:              {args.queries} at {args.latency_ms:g} ms each")
+    print(
+        f"sequential urllib:    {sequential:.3f}s "
+        f"({sequential_connections} connections)"
+    )
+    print(
+        f"pooled, 1 worker:     {pooled_one:.3f}s "
+        f"({pooled_one_connections} connections)"
+    )
+    print(
+        f"pooled, {args.workers} workers:    {pooled:.3f}s "
+        f"({pooled_connections} connections)"
+    )
+    print(f"speedup:              {sequential / pooled:.1f}x")
+    if stalled is not None:
+        print(
+            f"with a {args.stall_ms:g} ms stall: {stalled:.3f}s, "
+            f"{fetched}/{args.queries + 1} queries within the "
+            f"{args.deadline:g}s deadline"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare LIKE scans against the FTS5 index on a synthetic comment corpus.
+
+Run from the project root (the default builds a ~2M comment database):
+
+    uv run python -m benchmarks.search_fts --comments 2000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from wsbreporter import config
+from wsbreporter import storage
+
+WORDS = (
+    "calls puts yolo moon tendies bagholder dip rip squeeze earnings guidance "
+    "fed rates cpi inflation recession bull bear theta gamma iv crush hedge "
+    "short long shares options expiry strike premium portfolio loss gain"
+).split()
+TICKERS = ["SPY", "QQQ", "NVDA", "TSLA", "AAPL", "AMD", "MSFT", "GME", "PLTR"]
+
+
+def seed(num_comments: int, comments_per_post: int, seed_value: int) -> float:
+    rng = random.Random(seed_value)
+    scraped_at = storage._now_utc()
+    num_posts = max(num_comments // comments_per_post, 1)
+
+    def body() -> str:
+        words = rng.choices(WORDS, k=rng.randint(8, 30))
+        words.insert(rng.randrange(len(words)), rng.choice(TICKERS))
+        # A rare ticker so selective queries have something to find.
+        if rng.random() < 0.0005:
+            words.append("RKLB")
+        return " ".join(words)
+
+    conn = storage._connect()
+    started = time.perf_counter()
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO posts (
+                reddit_id, subreddit, title, selftext, url, first_scraped_at,
+                last_scraped_at
+            )
+            VALUES (?, 'wallstreetbets', ?, ?, 'https://example.com', ?, ?)
+            """,
+            (
+                (f"p{i}", body()[:80], body(), scraped_at, scraped_at)
+                for i in range(num_posts)
+            ),
+        )
+        conn.executemany(
+            """
+            INSERT INTO comments (
+                reddit_id, post_reddit_id, body, first_scraped_at, last_scraped_at
+            )
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                (f"c{i}", f"p{i % num_posts}", body(), scraped_at, scraped_at)
+                for i in range(num_comments)
+            ),
+        )
+    return time.perf_counter() - started
+
+
+def time_like(term: str) -> tuple[float, int]:
+    conn = storage._connect()
+    started = time.perf_counter()
+    rows = conn.execute(
+        """
+        SELECT reddit_id FROM comments WHERE body LIKE ?
+        UNION ALL
+        SELECT reddit_id FROM posts WHERE selftext LIKE ? OR title LIKE ?
+        """,
+        (f"%{term}%",) * 3,
+    ).fetchall()
+    return time.perf_counter() - started, len(rows)
+
+
+def time_fts(term: str, limit: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    results = storage.search_text(term, kinds=("posts", "comments"), limit=limit)
+    return time.perf_counter() - started, len(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--comments", type=int, default=2_000_000)
+    parser.add_argument("--comments-per-post", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.DATABASE_PATH = os.path.join(tmp_dir, "bench.sqlite3")
+        load = seed(args.comments, args.comments_per_post, args.seed)
+        print(f"loaded {args.comments:,} comments with live indexing in {load:.1f}s")
+
+        started = time.perf_counter()
+        storage.rebuild_search_index()
+        print(f"full index rebuild: {time.perf_counter() - started:.1f}s")
+
+        print(f"{'term':>8} {'LIKE':>10} {'rows':>8} {'FTS5':>10} {'top':>5}")
+        for term in ("RKLB", "NVDA", "squeeze"):
+            like_time, like_rows = time_like(term)
+            fts_time, fts_rows = time_fts(term, args.limit)
+            print(
+                f"{term:>8} {like_time:>9.3f}s {like_rows:>8} "
+                f"{fts_time:>9.3f}s {fts_rows:>5}"
+            )
+        storage.close_db()
+
+
+if __name__ == "__main__":
+    main()
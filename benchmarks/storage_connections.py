@@ -0,0 +1,108 @@
+"""Compare per-call SQLite connections against the managed storage connection.
+
+Run from the project root:
+
+    uv run python -m benchmarks.storage_connections --calls 2000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from wsbreporter import config
+from wsbreporter import storage
+
+
+def bench_per_call(db_path: str, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        # The old init_db re-ran the whole schema script on every call.
+        with conn:
+            storage._migration_initial_schema(conn)
+        conn.execute(
+            "SELECT generated_at FROM reports WHERE subreddit = ? LIMIT 1",
+            ("wallstreetbets",),
+        ).fetchone()
+        conn.close()
+    return time.perf_counter() - started
+
+
+def bench_managed(calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        storage.latest_report_generated_at("wallstreetbets")
+    return time.perf_counter() - started
+
+
+def bench_concurrent(calls: int) -> tuple[float, int]:
+    """Run a writer and a reader thread against the same database."""
+    errors = []
+    posts = [
+        {
+            "reddit_id": f"bench{i}",
+            "title": "bench",
+            "url": "https://example.com",
+            "score": i,
+            "comments": [],
+        }
+        for i in range(25)
+    ]
+
+    def writer() -> None:
+        try:
+            for _ in range(max(calls // 100, 1)):
+                storage.save_posts(posts, "wallstreetbets")
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    def reader() -> None:
+        try:
+            for _ in range(calls):
+                storage.load_recent_posts("wallstreetbets", 25)
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, len(errors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.DATABASE_PATH = os.path.join(tmp_dir, "bench.sqlite3")
+        storage.init_db()
+
+        per_call = bench_per_call(config.DATABASE_PATH, args.calls)
+        managed = bench_managed(args.calls)
+        concurrent, errors = bench_concurrent(args.calls // 10)
+        storage.close_db()
+
+    print(f"calls:                {args.calls}")
+    print(
+        f"per-call connections: {per_call:.3f}s "
+        f"({per_call / args.calls * 1e6:.0f} us/call)"
+    )
+    print(
+        f"managed connection:   {managed:.3f}s "
+        f"({managed / args.calls * 1e6:.0f} us/call)"
+    )
+    print(f"speedup:              {per_call / managed:.1f}x")
+    print(f"concurrent read/write: {concurrent:.3f}s, {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Time id-list lookups in storage at 1k, 10k and 100k ids.
+
+Compares the temp-table staging used by storage against a single
+IN (?, ?, ...) list, which fails once the id count passes SQLite's
+host-parameter limit.
+
+Run from the project root:
+
+    uv run python -m benchmarks.storage_id_lookups
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from wsbreporter import config
+from wsbreporter import storage
+
+
+def seed(num_posts: int) -> None:
+    conn = storage._connect()
+    scraped_at = storage._now_utc()
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO posts (
+                reddit_id, subreddit, title, url, first_scraped_at, last_scraped_at
+            )
+            VALUES (?, 'wallstreetbets', 'bench', 'https://example.com', ?, ?)
+            """,
+            ((f"p{i}", scraped_at, scraped_at) for i in range(num_posts)),
+        )
+        conn.executemany(
+            """
+            INSERT INTO post_snapshots (post_reddit_id, scraped_at, score)
+            VALUES (?, ?, ?)
+            """,
+            ((f"p{i}", scraped_at, i) for i in range(num_posts)),
+        )
+    storage.rebuild_latest_snapshots()
+
+
+def in_list_lookup(ids: list[str]) -> float | None:
+    conn = storage._connect()
+    placeholders = ",".join("?" for _ in ids)
+    started = time.perf_counter()
+    try:
+        conn.execute(
+            f"SELECT reddit_id FROM posts WHERE reddit_id IN ({placeholders})", ids
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return time.perf_counter() - started
+
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.DATABASE_PATH = os.path.join(tmp_dir, "bench.sqlite3")
+        seed(max(args.sizes))
+
+        print(
+            f"{'ids':>8} {'IN list':>10} {'existing':>10} {'load':>10} "
+            f"{'refresh':>10}"
+        )
+        for size in args.sizes:
+            ids = [f"p{i}" for i in range(size)]
+            in_list = in_list_lookup(ids)
+            in_list_label = f"{in_list:.3f}s" if in_list is not None else "error"
+            existing = timed(storage.existing_post_ids, ids)
+            load = timed(storage.load_posts, ids)
+            refresh = timed(storage.posts_needing_comment_refresh, ids, 2)
+            print(
+                f"{size:>8} {in_list_label:>10} {existing:>9.3f}s {load:>9.3f}s "
+                f"{refresh:>9.3f}s"
+            )
+        storage.close_db()
+
+
+if __name__ == "__main__":
+    main()
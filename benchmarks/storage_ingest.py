@@ -0,0 +1,70 @@
+"""Measure bulk ingest throughput of storage.save_posts.
+
+Run from the project root:
+
+    uv run python -m benchmarks.storage_ingest --posts 20000 --comments 20
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from wsbreporter import config
+from wsbreporter import storage
+
+
+def synthetic_posts(num_posts: int, num_comments: int, run: int = 0) -> list[dict]:
+    return [
+        {
+            "reddit_id": f"p{i}",
+            "title": f"Synthetic post {i}",
+            "selftext": "YOLO " * 40,
+            "url": f"https://www.reddit.com/r/wallstreetbets/comments/p{i}/",
+            "author": f"user{i % 500}",
+            "score": i + run,
+            "upvote_ratio": 0.9,
+            "num_comments": num_comments,
+            "created_utc": str(1_700_000_000 + i),
+            "is_pinned": False,
+            "comments": [
+                {
+                    "reddit_id": f"c{i}_{j}",
+                    "body": "To the moon " * 10,
+                    "url": f"https://www.reddit.com/r/wallstreetbets/comments/p{i}/_/c{i}_{j}/",
+                    "author": f"user{j}",
+                    "score": j + run,
+                    "created_utc": str(1_700_000_000 + i + j),
+                }
+                for j in range(num_comments)
+            ],
+        }
+        for i in range(num_posts)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.DATABASE_PATH = os.path.join(tmp_dir, "bench.sqlite3")
+        storage.init_db()
+        for run in range(args.runs):
+            posts = synthetic_posts(args.posts, args.comments, run)
+            stats = {}
+            started = time.perf_counter()
+            saved = storage.save_posts(posts, "wallstreetbets", stats=stats)
+            elapsed = time.perf_counter() - started
+            print(
+                f"run {run + 1}: {len(saved)} posts, {stats['rows']} rows in "
+                f"{elapsed:.2f}s ({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s)"
+            )
+        storage.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from wsbreporter import config
+from wsbreporter import storage
+
+
+def _report_deltas(monkeypatch, posts, report_times):
+    deltas = []
+    for generated_at in report_times:
+        monkeypatch.setattr(
+            storage,
+            "latest_report_generated_at",
+            lambda subreddit, at=generated_at: at,
+        )
+        current = [dict(post) for post in posts]
+        deltas.append(storage.add_report_deltas(current, "wallstreetbets"))
+    return deltas
+
+
+def test_report_deltas_survive_maintenance(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATABASE_PATH", str(tmp_path / "reddit.sqlite3"))
+    clock = [datetime.now(timezone.utc) - timedelta(days=20)]
+    monkeypatch.setattr(
+        storage, "_now_utc", lambda: clock[0].isoformat(timespec="seconds")
+    )
+    start = clock[0]
+
+    # Two days of 10-minute scrapes; scores move on most scrapes.
+    report_times = []
+    for step in range(2 * 24 * 6):
+        clock[0] = start + timedelta(minutes=10 * step)
+        posts = [
+            {
+                "reddit_id": f"p{i}",
+                "title": "t",
+                "score": step // (i + 1),
+                "num_comments": step // 3,
+                "upvote_ratio": 0.9,
+                "created_utc": start.timestamp(),
+                "comments": [],
+            }
+            for i in range(3)
+            if step >= 20 * i
+        ]
+        storage.save_posts(posts, "wallstreetbets")
+        if step % 17 == 5:
+            clock[0] += timedelta(minutes=3)
+            storage.save_report("report", clock[0].date().isoformat(), "wallstreetbets")
+            report_times.append(storage._now_utc())
+
+    latest = [
+        {"reddit_id": f"p{i}", "score": 1000, "num_comments": 100, "upvote_ratio": 1}
+        for i in range(3)
+    ]
+    before = _report_deltas(monkeypatch, latest, report_times)
+
+    stats = storage.run_maintenance(
+        raw_retention_days=7, hourly_retention_days=10, batch_hours=6
+    )
+    assert stats["post_snapshots_rows_removed"] > 0
+
+    after = _report_deltas(monkeypatch, latest, report_times)
+    storage.close_db()
+    assert after == before
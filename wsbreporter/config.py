@@ -11,6 +11,34 @@ REDDIT_USER_AGENT = os.getenv(
     "REDDIT_USER_AGENT"
 )  # A unique string to identify your application
 
+# Reddit API requests are sent freely while more than this many remain in the
+# rate-limit window, then spaced evenly until the window resets.
+REDDIT_RATE_LIMIT_BURST = int(os.getenv("REDDIT_RATE_LIMIT_BURST", "10"))
+# Posts whose comments are fetched at the same time.
+REDDIT_COMMENT_WORKERS = int(os.getenv("REDDIT_COMMENT_WORKERS", "4"))
+
+# Multi-subreddit scrapes run REDDIT_COMMENT_WORKERS workers per subreddit, up
+# to SCRAPE_MAX_WORKERS. Fetched comments are saved this many posts at a time.
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "16"))
+COMMENT_WRITE_BATCH_POSTS = int(os.getenv("COMMENT_WRITE_BATCH_POSTS", "10"))
+# Writes queued for the background writer before fetching waits for SQLite.
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "8"))
+
+# Snapshot-only refreshes re-poll posts scraped within this many hours.
+SNAPSHOT_TRACK_HOURS = float(os.getenv("SNAPSHOT_TRACK_HOURS", "48"))
+
+# The scrape daemon re-polls each tracked post once its score is expected to
+# move by DAEMON_SCORE_CHANGE points (or its comments by DAEMON_COMMENT_CHANGE),
+# within these bounds, and plans at most DAEMON_REQUESTS_PER_MINUTE requests.
+DAEMON_MIN_INTERVAL_MINUTES = float(os.getenv("DAEMON_MIN_INTERVAL_MINUTES", "3"))
+DAEMON_MAX_INTERVAL_MINUTES = float(os.getenv("DAEMON_MAX_INTERVAL_MINUTES", "240"))
+DAEMON_SCORE_CHANGE = float(os.getenv("DAEMON_SCORE_CHANGE", "25"))
+DAEMON_COMMENT_CHANGE = float(os.getenv("DAEMON_COMMENT_CHANGE", "20"))
+DAEMON_LISTING_INTERVAL_MINUTES = float(
+    os.getenv("DAEMON_LISTING_INTERVAL_MINUTES", "15")
+)
+DAEMON_REQUESTS_PER_MINUTE = int(os.getenv("DAEMON_REQUESTS_PER_MINUTE", "60"))
+
 # LLM provider. Supported values: gemini, deepseek, openai, openai-compatible
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").strip().lower()
 
@@ -51,6 +79,49 @@ REPORT_MAX_BODY_WORDS = int(os.getenv("REPORT_MAX_BODY_WORDS", "220"))
 # Refresh comments for an already-seen post after this many hours.
 COMMENT_REFRESH_HOURS = int(os.getenv("COMMENT_REFRESH_HOURS", "2"))
 
+# Only refresh stale comments when the post's comment count has grown since the
+# last comment fetch.
+COMMENT_REFRESH_REQUIRE_GROWTH = os.getenv(
+    "COMMENT_REFRESH_REQUIRE_GROWTH", "0"
+).strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+
+# Refresh stale posts incrementally: fetch only comments newer than the stored
+# ones and re-poll every stored comment's score in batches of 100.
+COMMENT_REFRESH_INCREMENTAL = os.getenv(
+    "COMMENT_REFRESH_INCREMENTAL", "0"
+).strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+
+# Streaming ingest: queue capacity between the stream readers and the writer,
+# and how many items (or seconds) go into each write.
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "200"))
+STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "5"))
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "5"))
+
+# Expand "load more comments" stubs when a post's comments are fetched in full,
+# highest-scoring threads first, within a request, depth and time budget.
+COMMENT_EXPANSION = os.getenv("COMMENT_EXPANSION", "").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+COMMENT_EXPANSION_MAX_REQUESTS = int(os.getenv("COMMENT_EXPANSION_MAX_REQUESTS", "20"))
+COMMENT_EXPANSION_MAX_DEPTH = int(os.getenv("COMMENT_EXPANSION_MAX_DEPTH", "5"))
+COMMENT_EXPANSION_DEADLINE_SECONDS = float(
+    os.getenv("COMMENT_EXPANSION_DEADLINE_SECONDS", "30")
+)
+
 # Path to the prompt template file (relative to project root)
 PROMPT_TEMPLATE_PATH = "templates/prompt_template_hindsight_v2.txt"
 EDITOR_PROMPT_TEMPLATE_PATH = os.getenv(
@@ -73,11 +144,47 @@ REPORT_WITH_NEWS = os.getenv("REPORT_WITH_NEWS", "").strip().lower() in {
 }
 NEWS_MAX_TERMS = int(os.getenv("NEWS_MAX_TERMS", "8"))
 NEWS_ITEMS_PER_TERM = int(os.getenv("NEWS_ITEMS_PER_TERM", "3"))
+# Supported providers: google-news-rss, local-files (RSS/JSON files read from
+# NEWS_LOCAL_DIR, for offline runs and load tests).
 NEWS_PROVIDER = os.getenv("NEWS_PROVIDER", "google-news-rss")
+NEWS_LOCAL_DIR = os.getenv("NEWS_LOCAL_DIR", "data/news")
+# Cached news for a query is reused until it is this many hours old.
+NEWS_STALE_HOURS = float(os.getenv("NEWS_STALE_HOURS", "6"))
+# Uncached queries are fetched in parallel over one keep-alive session. The
+# deadline bounds the whole news stage; slower queries are skipped this run.
+NEWS_FETCH_WORKERS = int(os.getenv("NEWS_FETCH_WORKERS", "4"))
+NEWS_FETCH_TIMEOUT_SECONDS = float(os.getenv("NEWS_FETCH_TIMEOUT_SECONDS", "10"))
+NEWS_FETCH_DEADLINE_SECONDS = float(os.getenv("NEWS_FETCH_DEADLINE_SECONDS", "20"))
+# News items are deduplicated across queries (same canonical URL, or titles at
+# least this similar), ranked, and trimmed to fit this many prompt tokens.
+NEWS_DUPLICATE_TITLE_SIMILARITY = float(
+    os.getenv("NEWS_DUPLICATE_TITLE_SIMILARITY", "0.7")
+)
+NEWS_CONTEXT_TOKEN_BUDGET = int(os.getenv("NEWS_CONTEXT_TOKEN_BUDGET", "1500"))
+# Keep each news item's raw RSS XML in news_items.raw (off by default).
+NEWS_STORE_RAW = os.getenv("NEWS_STORE_RAW", "").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
 
 # SQLite database path. Relative paths are resolved from the project root.
 DATABASE_PATH = os.getenv("DATABASE_PATH", "data/wsbreporter.sqlite3")
 
+# SQLite connection tuning. Connections are kept open for the life of the
+# process, so these only apply once per thread.
+DATABASE_BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", "5000"))
+DATABASE_MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE", str(256 * 1024 * 1024)))
+DATABASE_CACHE_SIZE_KB = int(os.getenv("DATABASE_CACHE_SIZE_KB", "65536"))
+
+# Snapshot retention for `python -m wsbreporter.storage maintain`. Snapshots
+# older than the raw window are rolled up per hour, and hourly rollups older
+# than the hourly window are rolled up per day.
+SNAPSHOT_RAW_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RAW_RETENTION_DAYS", "7"))
+SNAPSHOT_HOURLY_RETENTION_DAYS = int(os.getenv("SNAPSHOT_HOURLY_RETENTION_DAYS", "90"))
+SNAPSHOT_COMPACTION_BATCH_HOURS = int(os.getenv("SNAPSHOT_COMPACTION_BATCH_HOURS", "6"))
+
 
 def get_llm_model_name() -> str | None:
     if LLM_PROVIDER == "gemini":
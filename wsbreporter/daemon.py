@@ -0,0 +1,429 @@
+"""Keep scraping a subreddit, re-polling each tracked post at its own pace.
+
+Every tracked post has a next snapshot time and a next comment refresh time,
+set from how fast its score and comment count moved recently: hot posts come
+back every few minutes, quiet ones back off to hours. The listing is re-read
+periodically to pick up new posts, and all planned work stays within
+DAEMON_REQUESTS_PER_MINUTE. Run from the project root:
+
+    uv run python -m wsbreporter.daemon --metrics-file data/daemon-metrics.json
+"""
+
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from datetime import datetime
+from typing import Any
+
+from . import config
+from . import reddit
+from . import scraper
+from . import storage
+
+SNAPSHOT = "snapshot"
+COMMENTS = "comments"
+# The info endpoint answers up to 100 posts or comments per request.
+INFO_BATCH_SIZE = 100
+# Velocities compare the latest snapshot with the post an hour earlier.
+VELOCITY_WINDOW_HOURS = 1.0
+# Never sleep longer than this between cycles.
+MAX_SLEEP_SECONDS = 60.0
+
+
+def poll_interval(per_hour: float | None, change: float) -> float:
+    """Seconds until about ``change`` more points accrue at ``per_hour``."""
+    low = config.DAEMON_MIN_INTERVAL_MINUTES * 60
+    high = config.DAEMON_MAX_INTERVAL_MINUTES * 60
+    if not per_hour:
+        return high
+    return min(max(change / per_hour * 3600, low), high)
+
+
+def retry_interval(failures: int) -> float:
+    """Seconds before retrying a job that failed ``failures`` times in a row."""
+    low = config.DAEMON_MIN_INTERVAL_MINUTES * 60
+    high = config.DAEMON_MAX_INTERVAL_MINUTES * 60
+    return min(low * 2 ** (failures - 1), high)
+
+
+class RequestBudget:
+    """Token bucket of Reddit API requests the daemon may plan.
+
+    The bucket holds up to a minute of requests and refills continuously, so
+    a quiet spell allows one burst but the long-run rate never exceeds
+    ``per_minute``.
+    """
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        return self._tokens
+
+    def spend(self, requests: float) -> None:
+        self.available()
+        self._tokens -= requests
+
+    def seconds_until(self, requests: float) -> float:
+        return max(requests - self.available(), 0.0) / self.rate
+
+
+class ScrapeDaemon:
+    """Priority queue of (post, snapshot or comments) jobs keyed by due time."""
+
+    def __init__(
+        self,
+        subreddit: str | None = None,
+        sort_by: str = "hot",
+        num_posts: int | None = None,
+        skip_pinned: bool = False,
+        metrics_path: str | None = None,
+    ):
+        self.subreddit = subreddit or config.SUBREDDIT_NAME
+        self.sort_by = sort_by
+        self.num_posts = num_posts or config.NUM_POSTS_TO_FETCH
+        self.skip_pinned = skip_pinned
+        self.metrics_path = metrics_path
+        self.budget = RequestBudget(config.DAEMON_REQUESTS_PER_MINUTE)
+
+        # Heap of (due, seq, kind, post_id). A job is current only while
+        # self._jobs still maps (kind, post_id) to the same (due, seq).
+        self._queue: list[tuple[float, int, str, str]] = []
+        self._jobs: dict[tuple[str, str], tuple[float, int]] = {}
+        self._seq = itertools.count()
+        self._next_listing = 0.0
+        # Post id to (consecutive failures, retry time) of its comment job.
+        self._comment_retries: dict[str, tuple[int, float]] = {}
+        # Stored comment counts of this cycle's due comment jobs.
+        self._stored_comments: dict[str, int] = {}
+        self._requests_seen = reddit.rate_limit_metrics()["requests"]
+        self._totals = {"cycles": 0, SNAPSHOT: 0, COMMENTS: 0, "requests": 0}
+        self._last_cycle: dict[str, Any] = {}
+
+    def run(self, cycles: int | None = None) -> None:
+        comment_cost = self._comment_cost([None])
+        if comment_cost > self.budget.capacity:
+            print(
+                f"Warning: refreshing one post's comments can cost {comment_cost} "
+                f"requests, more than DAEMON_REQUESTS_PER_MINUTE "
+                f"({self.budget.capacity:.0f}). Comment refreshes will run one "
+                "at a time, each after the budget refills."
+            )
+        tracked = storage.tracked_post_ids(self.subreddit, config.SNAPSHOT_TRACK_HOURS)
+        print(f"Tracking {len(tracked)} stored posts from r/{self.subreddit}.")
+        self._schedule(tracked)
+        for cycle in itertools.count(1):
+            self.run_cycle()
+            if cycles is not None and cycle >= cycles:
+                break
+            time.sleep(self._sleep_seconds())
+
+    def run_cycle(self) -> None:
+        started = time.time()
+        cycle = {SNAPSHOT: 0, COMMENTS: 0, "lag_seconds": 0.0}
+        if started >= self._next_listing and self._can_afford(
+            math.ceil(self.num_posts / 100)
+        ):
+            self._discover()
+            self._next_listing = started + config.DAEMON_LISTING_INTERVAL_MINUTES * 60
+
+        due = self._pop_due(started)
+        self._stored_comments = {}
+        if config.COMMENT_REFRESH_INCREMENTAL:
+            self._stored_comments = storage.stored_comment_counts(
+                [post_id for *_, kind, post_id in due if kind == COMMENTS]
+            )
+        lags = []
+        for kind, run_jobs, cost in (
+            (SNAPSHOT, self._poll_snapshots, self._snapshot_cost),
+            (COMMENTS, self._refresh_comments, self._comment_cost),
+        ):
+            jobs = sorted(job for job in due if job[2] == kind)
+            take = 0
+            while take < len(jobs):
+                requests = cost([post_id for *_, post_id in jobs[: take + 1]])
+                # A batch bigger than the whole bucket only ever holds one job.
+                if take and requests > self.budget.capacity:
+                    break
+                if not self._can_afford(requests):
+                    break
+                take += 1
+            for due_at, _, _, post_id in jobs[take:]:
+                # Over budget: keep the job due, so its lag keeps growing.
+                self._push(kind, post_id, due_at)
+            if take:
+                run_jobs([post_id for *_, post_id in jobs[:take]])
+                lags.extend(started - due_at for due_at, *_ in jobs[:take])
+                cycle[kind] = take
+                self._totals[kind] += take
+
+        self._totals["cycles"] += 1
+        cycle["lag_seconds"] = sum(lags) / len(lags) if lags else 0.0
+        self._last_cycle = cycle
+        self._report()
+
+    def metrics(self) -> dict[str, Any]:
+        """Return queue depth, lag and request counters."""
+        now = time.time()
+        due_lags = [now - due_at for due_at, _ in self._jobs.values() if due_at <= now]
+        return {
+            "subreddit": self.subreddit,
+            "tracked_posts": len({post_id for _, post_id in self._jobs}),
+            "queue_depth": len(self._jobs),
+            "due": len(due_lags),
+            "max_lag_seconds": max(due_lags, default=0.0),
+            "last_cycle": self._last_cycle,
+            "totals": dict(self._totals),
+            "budget_available": self.budget.available(),
+            "budget_per_minute": self.budget.capacity,
+            "reddit": reddit.rate_limit_metrics(),
+        }
+
+    def _discover(self) -> None:
+        posts = reddit.fetch_top_posts(
+            num_posts=self.num_posts,
+            subreddit=self.subreddit,
+            sort_by=self.sort_by,
+            skip_pinned=self.skip_pinned,
+            fetch_comments=False,
+        )
+        self._charge_requests()
+        if not posts:
+            print("Failed to fetch the listing; retrying at the next interval.")
+            return
+        for post in posts:
+            post["comments"] = []
+            post["comments_fetched"] = False
+        storage.save_posts(posts, self.subreddit, include_stored_comments=False)
+        self._schedule([post["reddit_id"] for post in posts])
+
+    def _poll_snapshots(self, post_ids: list[str]) -> None:
+        posts = reddit.fetch_post_snapshots(post_ids)
+        self._charge_requests()
+        if posts:
+            for post in posts:
+                post["comments_fetched"] = False
+            storage.save_posts(posts, self.subreddit, include_stored_comments=False)
+        # Posts that failed or vanished are retried at their backed-off pace.
+        self._schedule(post_ids)
+
+    def _refresh_comments(self, post_ids: list[str]) -> None:
+        activity = storage.post_activity(post_ids)
+        saved = scraper.refresh_comments(
+            post_ids,
+            num_comments={
+                post_id: entry["num_comments"] for post_id, entry in activity.items()
+            },
+            incremental_ids={
+                post_id
+                for post_id, entry in activity.items()
+                if entry["comments_scraped_at"] is not None
+            },
+        )
+        self._charge_requests()
+        now = time.time()
+        for post_id in post_ids:
+            if post_id in saved:
+                self._comment_retries.pop(post_id, None)
+                continue
+            # Its comments_scraped_at did not move, so without a backoff the
+            # job would be due again at once.
+            failures = self._comment_retries.get(post_id, (0, 0.0))[0] + 1
+            self._comment_retries[post_id] = (failures, now + retry_interval(failures))
+        self._schedule(post_ids)
+
+    def _schedule(self, post_ids: list[str]) -> None:
+        """(Re)schedule both jobs of each post from its stored activity."""
+        now = time.time()
+        activity = storage.post_activity(post_ids, VELOCITY_WINDOW_HOURS)
+        for post_id in post_ids:
+            entry = activity.get(post_id)
+            if entry is None:
+                # No snapshot yet; the next poll creates one.
+                self._push(SNAPSHOT, post_id, now)
+                continue
+            try:
+                age_hours = (now - float(entry["created_utc"])) / 3600
+            except (TypeError, ValueError):
+                age_hours = 0.0
+            if age_hours > config.SNAPSHOT_TRACK_HOURS:
+                self._jobs.pop((SNAPSHOT, post_id), None)
+                self._jobs.pop((COMMENTS, post_id), None)
+                self._comment_retries.pop(post_id, None)
+                continue
+
+            self._push(
+                SNAPSHOT,
+                post_id,
+                _timestamp(entry["last_snapshot_at"])
+                + poll_interval(entry["score_per_hour"], config.DAEMON_SCORE_CHANGE),
+            )
+            if entry["comments_scraped_at"] is None:
+                comments_due = now
+            else:
+                comments_due = _timestamp(entry["comments_scraped_at"]) + poll_interval(
+                    entry["comments_per_hour"], config.DAEMON_COMMENT_CHANGE
+                )
+            retry = self._comment_retries.get(post_id)
+            if retry is not None:
+                comments_due = max(comments_due, retry[1])
+            self._push(COMMENTS, post_id, comments_due)
+
+    def _push(self, kind: str, post_id: str, due_at: float) -> None:
+        seq = next(self._seq)
+        self._jobs[(kind, post_id)] = (due_at, seq)
+        heapq.heappush(self._queue, (due_at, seq, kind, post_id))
+
+    def _pop_due(self, now: float) -> list[tuple[float, int, str, str]]:
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due_at, seq, kind, post_id = heapq.heappop(self._queue)
+            if self._jobs.get((kind, post_id)) == (due_at, seq):
+                del self._jobs[(kind, post_id)]
+                due.append((due_at, seq, kind, post_id))
+        return due
+
+    def _next_due(self) -> float | None:
+        while self._queue:
+            due_at, seq, kind, post_id = self._queue[0]
+            if self._jobs.get((kind, post_id)) == (due_at, seq):
+                return due_at
+            heapq.heappop(self._queue)
+        return None
+
+    def _snapshot_cost(self, post_ids: list) -> int:
+        return math.ceil(len(post_ids) / INFO_BATCH_SIZE)
+
+    def _comment_cost(self, post_ids: list) -> int:
+        # One comment page per post plus its reply expansions, and its stored
+        # comments re-polled through the info endpoint, 100 per request.
+        per_post = 1 + (
+            config.COMMENT_EXPANSION_MAX_REQUESTS if config.COMMENT_EXPANSION else 0
+        )
+        return sum(
+            per_post
+            + math.ceil(self._stored_comments.get(post_id, 0) / INFO_BATCH_SIZE)
+            for post_id in post_ids
+        )
+
+    def _can_afford(self, requests: int) -> bool:
+        # Work costing more than the whole bucket would never fit, so it runs
+        # once the bucket is full and the overdraft is paid back afterwards.
+        return self.budget.available() >= min(requests, self.budget.capacity)
+
+    def _charge_requests(self) -> None:
+        requests = reddit.rate_limit_metrics()["requests"]
+        self.budget.spend(requests - self._requests_seen)
+        self._totals["requests"] += requests - self._requests_seen
+        self._requests_seen = requests
+
+    def _sleep_seconds(self) -> float:
+        now = time.time()
+        next_due = self._next_due()
+        wake_at = min(math.inf if next_due is None else next_due, self._next_listing)
+        if wake_at <= now:
+            # Work is waiting on the budget; sleep until one request frees up.
+            return min(max(self.budget.seconds_until(1), 1.0), MAX_SLEEP_SECONDS)
+        return min(max(wake_at - now, 1.0), MAX_SLEEP_SECONDS)
+
+    def _report(self) -> None:
+        metrics = self.metrics()
+        cycle = metrics["last_cycle"]
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] "
+            f"polled {cycle[SNAPSHOT]} snapshots, {cycle[COMMENTS]} comment threads "
+            f"(mean lag {cycle['lag_seconds']:.0f}s); "
+            f"queue {metrics['queue_depth']} jobs for {metrics['tracked_posts']} "
+            f"posts, {metrics['due']} due, max lag {metrics['max_lag_seconds']:.0f}s; "
+            f"budget {metrics['budget_available']:.0f}/"
+            f"{metrics['budget_per_minute']:.0f} requests."
+        )
+        if self.metrics_path:
+            os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+            tmp_path = f"{self.metrics_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(dict(metrics, updated_at=time.time()), f, indent=2)
+            os.replace(tmp_path, self.metrics_path)
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Continuously scrape a subreddit with adaptive per-post polling"
+    )
+    parser.add_argument(
+        "-p",
+        "--posts",
+        type=int,
+        default=config.NUM_POSTS_TO_FETCH,
+        help=f"Posts to read from each listing (default: {config.NUM_POSTS_TO_FETCH})",
+    )
+    parser.add_argument(
+        "-s",
+        "--subreddit",
+        type=str,
+        default=config.SUBREDDIT_NAME,
+        help=f"Subreddit to follow (default: {config.SUBREDDIT_NAME})",
+    )
+    parser.add_argument(
+        "--sort",
+        type=str,
+        choices=["hot", "new", "top", "rising"],
+        default="hot",
+        help="Listing that new posts are discovered from (default: hot)",
+    )
+    parser.add_argument(
+        "--skip-pinned",
+        action="store_true",
+        help="Skip pinned/stickied posts like weekly threads",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        help="Write queue and lag metrics as JSON to this file after every cycle",
+    )
+    parser.add_argument(
+        "--cycles",
+        type=int,
+        help="Stop after this many cycles (default: run until interrupted)",
+    )
+    args = parser.parse_args()
+
+    if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET:
+        print("Error: Please set your Reddit API keys in .env before scraping.")
+        return
+
+    daemon = ScrapeDaemon(
+        subreddit=args.subreddit,
+        sort_by=args.sort,
+        num_posts=args.posts,
+        skip_pinned=args.skip_pinned,
+        metrics_path=args.metrics_file,
+    )
+    try:
+        daemon.run(cycles=args.cycles)
+    except KeyboardInterrupt:
+        print("Stopping.")
+    finally:
+        reddit.print_rate_limit_metrics()
+        storage.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from . import storage
+
+EXPORT_TABLES = ("post_snapshots", "comment_snapshots")
+# How far before the previous export to look for extended snapshot runs. It
+# covers scrapes that had started, but not committed, when that export read.
+VALID_TO_OVERLAP = timedelta(hours=1)
+
+
+def export_snapshots(
+    output_dir: str,
+    tables: tuple[str, ...] = EXPORT_TABLES,
+    file_format: str = "parquet",
+    batch_rows: int = 50_000,
+    full: bool = False,
+) -> dict[str, int]:
+    """Export snapshot history as columnar files partitioned by subreddit/date.
+
+    Files are written under ``<output_dir>/<table>/subreddit=<name>/date=<day>``
+    so Arrow, DuckDB, Polars and Spark can read the tree as one dataset.
+    Each run appends only snapshots newer than the last export to the same
+    directory, and rewrites the files of exported rows whose ``valid_to``
+    has been extended since. ``full`` exports everything into a fresh
+    directory and swaps it in place of the old one.
+
+    Requires pyarrow (``uv run --with pyarrow ...``).
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError(
+            "Snapshot export needs pyarrow. Run it with "
+            "'uv run --with pyarrow python -m wsbreporter.export ...'."
+        ) from e
+
+    if file_format not in ("parquet", "arrow"):
+        raise ValueError(f"Unsupported export format '{file_format}'.")
+
+    output_dir = os.path.abspath(output_dir)
+    exported = {}
+    for table in tables:
+        watermark_name = f"{table}:{output_dir}"
+        table_dir = os.path.join(output_dir, table)
+        # Every change committed before this point is in what we read next.
+        started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if full:
+            after_id = 0
+            write_dir = table_dir + ".full"
+            shutil.rmtree(write_dir, ignore_errors=True)
+        else:
+            after_id = storage.export_watermark(watermark_name)
+            write_dir = table_dir
+            previous_export = storage.export_watermark_time(watermark_name)
+            if after_id and previous_export:
+                since = datetime.fromisoformat(previous_export) - VALID_TO_OVERLAP
+                _refresh_valid_to(
+                    pa,
+                    table,
+                    storage.extended_snapshot_runs(
+                        table, after_id, since.isoformat(timespec="seconds")
+                    ),
+                    table_dir,
+                    file_format,
+                )
+
+        schema = _arrow_schema(pa, table)
+        row_count = 0
+        last_id = after_id
+        for rows in storage.iter_snapshot_batches(table, after_id, batch_rows):
+            for (subreddit, day), partition_rows in _partition_rows(rows).items():
+                partition_dir = os.path.join(
+                    write_dir, f"subreddit={subreddit}", f"date={day}"
+                )
+                _write_partition(pa, schema, partition_rows, partition_dir, file_format)
+            row_count += len(rows)
+            last_id = rows[-1]["snapshot_id"]
+            if not full:
+                # Advance after every batch so an interrupted export resumes here.
+                storage.set_export_watermark(watermark_name, last_id, started_at)
+
+        if full:
+            # Swap the new tree in, so rows from older parts (including ones
+            # maintenance has since deleted) are not exported twice.
+            old_dir = table_dir + ".old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(table_dir):
+                os.rename(table_dir, old_dir)
+            if os.path.exists(write_dir):
+                os.rename(write_dir, table_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        storage.set_export_watermark(watermark_name, last_id, started_at)
+        exported[table] = row_count
+    return exported
+
+
+def _refresh_valid_to(
+    pa,
+    table: str,
+    rows: list[dict[str, Any]],
+    table_dir: str,
+    file_format: str,
+) -> None:
+    """Rewrite exported files whose rows' ``valid_to`` has moved since."""
+    extension = "parquet" if file_format == "parquet" else "arrow"
+    valid_to_by_file: dict[str, dict[int, str]] = defaultdict(dict)
+    parts_by_dir: dict[str, list[tuple[int, int, str]]] = {}
+    for row in rows:
+        partition_dir = os.path.join(
+            table_dir, f"subreddit={row['subreddit']}", f"date={row['scraped_at'][:10]}"
+        )
+        if partition_dir not in parts_by_dir:
+            parts_by_dir[partition_dir] = _partition_parts(partition_dir, extension)
+        for first_id, last_id, path in parts_by_dir[partition_dir]:
+            if first_id <= row["snapshot_id"] <= last_id:
+                valid_to_by_file[path][row["snapshot_id"]] = row["valid_to"]
+                break
+
+    updated = 0
+    for path, valid_to in valid_to_by_file.items():
+        data = _read_table(path, file_format)
+        values = data.column("valid_to").to_pylist()
+        new_values = [
+            valid_to.get(snapshot_id, value)
+            for snapshot_id, value in zip(
+                data.column("snapshot_id").to_pylist(), values, strict=True
+            )
+        ]
+        if new_values == values:
+            continue
+        updated += sum(old != new for old, new in zip(values, new_values, strict=True))
+        data = data.set_column(
+            data.schema.get_field_index("valid_to"),
+            "valid_to",
+            pa.array(new_values, pa.string()),
+        )
+        _write_table(data, path, file_format)
+    if updated:
+        print(f"Updated valid_to of {updated} exported {table} rows.")
+
+
+def _partition_parts(partition_dir: str, extension: str) -> list[tuple[int, int, str]]:
+    """List a partition's ``part-<first>-<last>`` files with their id ranges."""
+    if not os.path.isdir(partition_dir):
+        return []
+    parts = []
+    for name in os.listdir(partition_dir):
+        stem, dot, ext = name.partition(".")
+        if ext != extension or not stem.startswith("part-"):
+            continue
+        first_id, _, last_id = stem.removeprefix("part-").partition("-")
+        parts.append((int(first_id), int(last_id), os.path.join(partition_dir, name)))
+    return parts
+
+
+def _partition_rows(
+    rows: list[dict[str, Any]],
+) -> dict[tuple[str, str], list[dict[str, Any]]]:
+    partitions = defaultdict(list)
+    for row in rows:
+        partitions[(row["subreddit"], row["scraped_at"][:10])].append(row)
+    return partitions
+
+
+def _write_partition(
+    pa,
+    schema,
+    rows: list[dict[str, Any]],
+    partition_dir: str,
+    file_format: str,
+) -> None:
+    os.makedirs(partition_dir, exist_ok=True)
+    # Partition values live in the directory names, not in the files.
+    table = pa.Table.from_pylist(
+        [
+            {key: value for key, value in row.items() if key != "subreddit"}
+            for row in rows
+        ],
+        schema=schema,
+    )
+    first_id = rows[0]["snapshot_id"]
+    last_id = rows[-1]["snapshot_id"]
+    extension = "parquet" if file_format == "parquet" else "arrow"
+    path = os.path.join(
+        partition_dir, f"part-{first_id:012d}-{last_id:012d}.{extension}"
+    )
+    _write_table(table, path, file_format)
+
+
+def _write_table(table, path: str, file_format: str) -> None:
+    # Write then rename so readers never see a half-written file.
+    tmp_path = path + ".tmp"
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, tmp_path, compression="zstd")
+    else:
+        from pyarrow import feather
+
+        feather.write_feather(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def _read_table(path: str, file_format: str):
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path)
+    from pyarrow import feather
+
+    return feather.read_table(path)
+
+
+def _arrow_schema(pa, table: str):
+    if table == "post_snapshots":
+        return pa.schema(
+            [
+                ("snapshot_id", pa.int64()),
+                ("post_reddit_id", pa.string()),
+                ("scraped_at", pa.string()),
+                ("valid_to", pa.string()),
+                ("score", pa.int64()),
+                ("upvote_ratio", pa.float64()),
+                ("num_comments", pa.int64()),
+                ("is_pinned", pa.int8()),
+                ("title", pa.string()),
+                ("author", pa.string()),
+                ("created_utc", pa.string()),
+            ]
+        )
+    return pa.schema(
+        [
+            ("snapshot_id", pa.int64()),
+            ("comment_reddit_id", pa.string()),
+            ("post_reddit_id", pa.string()),
+            ("scraped_at", pa.string()),
+            ("valid_to", pa.string()),
+            ("score", pa.int64()),
+            ("author", pa.string()),
+            ("created_utc", pa.string()),
+        ]
+    )
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Export snapshot history to partitioned Parquet/Arrow files"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="exports",
+        help="Directory to write the dataset to (default: exports)",
+    )
+    parser.add_argument(
+        "-t",
+        "--table",
+        action="append",
+        choices=EXPORT_TABLES,
+        help="Snapshot table to export (repeatable, default: both)",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["parquet", "arrow"],
+        default="parquet",
+        help="Output file format (default: parquet)",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=50_000,
+        help="Rows read from SQLite per batch (default: 50000)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the export watermark and export all history again",
+    )
+    args = parser.parse_args()
+
+    try:
+        exported = export_snapshots(
+            args.output,
+            tables=tuple(args.table or EXPORT_TABLES),
+            file_format=args.format,
+            batch_rows=args.batch_rows,
+            full=args.full,
+        )
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return
+
+    for table, row_count in exported.items():
+        print(f"Exported {row_count} new {table} rows to {args.output}/{table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,35 @@
 import html
+import json
+import os
 import re
+import threading
+import time
 import urllib.parse
-import urllib.request
 import xml.etree.ElementTree as ET
+import zlib
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
 from typing import Any
 
-from . import config
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config, storage
+
+GOOGLE_NEWS_RSS_URL = "https://news.google.com/rss/search"
+USER_AGENT = "wsbreporter/0.1 (+https://github.com/)"
+
+# Query parameters that only track where a click came from.
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "cmpid", "guccounter"}
+_SHINGLE_SIZE = 5
+NEWS_RECENCY_HALF_LIFE_HOURS = 24
+_LOCAL_NEWS_EXTENSIONS = (".xml", ".rss", ".json")
+
+_http_session = None
+_http_session_lock = threading.Lock()
 
 
 def build_news_context_from_queries(
@@ -16,85 +38,544 @@ def build_news_context_from_queries(
     if not queries:
         return "", []
 
+    queries = queries[: config.NEWS_MAX_TERMS]
+    items_by_query = _load_or_fetch(queries)
+    candidates = [
+        item
+        for query in queries
+        for item in items_by_query.get(query, [])[: config.NEWS_ITEMS_PER_TERM]
+    ]
+    if not candidates:
+        return "", []
+
+    unique_items = _dedupe_news_items(candidates)
+    used_items = _fit_to_token_budget(
+        _rank_news_items(unique_items), config.NEWS_CONTEXT_TOKEN_BUDGET
+    )
+    context = _render_news_context(queries, used_items)
+
+    naive_tokens = _estimate_tokens(_render_news_context(queries, candidates))
+    context_tokens = _estimate_tokens(context)
+    print(
+        f"News context: kept {len(used_items)} of {len(candidates)} items "
+        f"({len(candidates) - len(unique_items)} duplicates), "
+        f"~{context_tokens} tokens (saved ~{naive_tokens - context_tokens})."
+    )
+    return context, used_items
+
+
+def _render_news_context(queries: list[str], items: list[dict[str, Any]]) -> str:
+    """Render items grouped under the query that found them, in query order."""
+    if not items:
+        return ""
+
+    items_by_query = {}
+    for item in items:
+        items_by_query.setdefault(item.get("query", ""), []).append(item)
+
     context_lines = ["External News Context:"]
-    used_items = []
-    for query in queries[: config.NEWS_MAX_TERMS]:
-        items = _load_or_fetch(query)
-        if not items:
+    for query in queries:
+        if query not in items_by_query:
             continue
-
         context_lines.append(f"{query}:")
-        for item in items[: config.NEWS_ITEMS_PER_TERM]:
-            used_items.append(item)
-            context_lines.append(f"- Title: {item.get('title', '')}")
-            if item.get("source_name"):
-                context_lines.append(f"  Source: {item['source_name']}")
-            if item.get("published_at"):
-                context_lines.append(f"  Published: {item['published_at']}")
-            if item.get("summary"):
-                context_lines.append(f"  Summary: {item['summary']}")
-            context_lines.append(f"  URL: {item.get('url', '')}")
-
-    if not used_items:
-        return "", []
+        for item in items_by_query[query]:
+            context_lines.extend(_format_news_item(item))
+    return "\n".join(context_lines) + "\n"
+
+
+def _format_news_item(item: dict[str, Any]) -> list[str]:
+    lines = [f"- Title: {item.get('title', '')}"]
+    if item.get("source_name"):
+        lines.append(f"  Source: {item['source_name']}")
+    if item.get("published_at"):
+        lines.append(f"  Published: {item['published_at']}")
+    if item.get("summary"):
+        lines.append(f"  Summary: {item['summary']}")
+    lines.append(f"  URL: {item.get('url', '')}")
+    return lines
+
+
+def _dedupe_news_items(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Drop repeats of the same article found by different queries.
+
+    Two items are the same article when their canonical URLs match or their
+    titles' shingle sets are nearly identical. The first copy is kept and
+    remembers every query that found it in ``matched_queries``.
+    """
+    kept = []
+    kept_by_url = {}
+    kept_shingles = []
+    for item in items:
+        url = _canonical_url(item.get("url", ""))
+        shingles = _title_shingles(item.get("title", ""), item.get("source_name"))
+        duplicate_of = kept_by_url.get(url) if url else None
+        if duplicate_of is None:
+            for index, other_shingles in enumerate(kept_shingles):
+                if (
+                    _jaccard(shingles, other_shingles)
+                    >= config.NEWS_DUPLICATE_TITLE_SIMILARITY
+                ):
+                    duplicate_of = index
+                    break
 
-    return "\n".join(context_lines) + "\n", used_items
+        query = item.get("query", "")
+        if duplicate_of is not None:
+            matched = kept[duplicate_of]["matched_queries"]
+            if query not in matched:
+                matched.append(query)
+            continue
+
+        if url:
+            kept_by_url[url] = len(kept)
+        kept_shingles.append(shingles)
+        kept.append(dict(item, matched_queries=[query]))
+    return kept
+
+
+def _rank_news_items(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Order items by recency plus how well they match the queries."""
+    now = datetime.now(timezone.utc)
+
+    def score(item: dict[str, Any]) -> float:
+        recency = 0.0
+        published = _parse_iso_datetime(item.get("published_at"))
+        if published is not None:
+            age_hours = max((now - published).total_seconds() / 3600, 0.0)
+            recency = 0.5 ** (age_hours / NEWS_RECENCY_HALF_LIFE_HOURS)
+
+        title_terms = _terms(item.get("title", ""))
+        term_overlap = max(
+            (
+                len(_terms(query) & title_terms) / len(_terms(query))
+                for query in item["matched_queries"]
+                if _terms(query)
+            ),
+            default=0.0,
+        )
+        # An article several queries found is more central to the day.
+        query_overlap = (len(item["matched_queries"]) - 1) * 0.5
+        return recency + term_overlap + query_overlap
 
+    return sorted(items, key=score, reverse=True)
 
-def _load_or_fetch(query: str) -> list[dict[str, Any]]:
+
+def _fit_to_token_budget(
+    items: list[dict[str, Any]], token_budget: int
+) -> list[dict[str, Any]]:
+    """Take items in rank order while their rendered size fits the budget."""
+    kept = []
+    used_tokens = _estimate_tokens("External News Context:")
+    headed_queries = set()
+    for item in items:
+        query = item.get("query", "")
+        tokens = _estimate_tokens("\n".join(_format_news_item(item)))
+        if query not in headed_queries:
+            tokens += _estimate_tokens(f"{query}:")
+        if used_tokens + tokens > token_budget:
+            continue
+        used_tokens += tokens
+        headed_queries.add(query)
+        kept.append(item)
+    return kept
+
+
+def _canonical_url(url: str) -> str:
+    """Normalize a URL so trivially different links to one article compare equal."""
+    url = url.strip()
+    if not url:
+        return ""
+    parts = urllib.parse.urlsplit(url)
+    host = parts.netloc.lower()
+    host = host.removeprefix("www.")
+    params = sorted(
+        (key, value)
+        for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit(("", host, path, urllib.parse.urlencode(params), ""))
+
+
+def _title_shingles(title: str, source_name: str | None = None) -> set[int]:
+    """Hash the title's character shingles, ignoring case, punctuation and source.
+
+    Google News appends " - <source>" to titles, which would otherwise make
+    the same headline from two outlets look different.
+    """
+    if source_name:
+        title = title.removesuffix(f" - {source_name}")
+    text = " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+    if len(text) <= _SHINGLE_SIZE:
+        return {zlib.crc32(text.encode())} if text else set()
+    return {
+        zlib.crc32(text[i : i + _SHINGLE_SIZE].encode())
+        for i in range(len(text) - _SHINGLE_SIZE + 1)
+    }
+
+
+def _jaccard(left: set[int], right: set[int]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _terms(text: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text.
+    return (len(text) + 3) // 4
+
+
+def _parse_iso_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
     try:
-        fetched = _fetch_google_news_rss(query)
-    except Exception as e:
-        print(f"News fetch failed for '{query}': {e}")
-        return []
-    if not fetched:
-        return []
-    return fetched[: config.NEWS_ITEMS_PER_TERM]
-
-
-def _fetch_google_news_rss(query: str) -> list[dict[str, Any]]:
-    encoded_query = urllib.parse.urlencode(
-        {
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _load_or_fetch(queries: list[str]) -> dict[str, list[dict[str, Any]]]:
+    """Serve queries from the SQLite cache, fetching and caching the rest."""
+    provider = get_news_provider(config.NEWS_PROVIDER)
+    items_by_query = storage.cached_news_items(
+        provider.name, queries, config.NEWS_STALE_HOURS
+    )
+    misses = [query for query in queries if query not in items_by_query]
+    print(f"News cache: {len(queries) - len(misses)} hits, {len(misses)} misses.")
+
+    validators = storage.news_validators(provider.name, misses)
+    feeds = provider.fetch(misses, validators)
+    not_modified = 0
+    # Save in query order, from this thread, once the fetch is done.
+    for query in misses:
+        feed = feeds.get(query)
+        if feed is None:
+            continue
+        if feed.not_modified:
+            items = storage.renew_news_items(
+                provider.name, query, feed.etag, feed.last_modified
+            )
+            if items is not None:
+                items_by_query[query] = items
+                not_modified += 1
+            continue
+        items_by_query[query] = storage.save_news_items(
+            provider.name,
+            query,
+            feed.items[: config.NEWS_ITEMS_PER_TERM],
+            feed.etag,
+            feed.last_modified,
+        )
+    if not_modified:
+        print(f"News feeds unchanged since last fetch: {not_modified}.")
+    return items_by_query
+
+
+class NewsConfigError(ValueError):
+    pass
+
+
+@dataclass
+class FetchedFeed:
+    items: list[dict[str, Any]] = field(default_factory=list)
+    etag: str | None = None
+    last_modified: str | None = None
+    not_modified: bool = False
+
+
+@dataclass
+class NewsProvider:
+    """A news source: batch of queries in, one FetchedFeed per query out.
+
+    Providers implement either ``fetch_query`` (one query, run sequentially or
+    on the fetch pool depending on ``concurrent``) or ``fetch_batch`` (the
+    whole batch at once, for sources that can answer many queries together).
+    Queries missing from the result were not fetched and stay uncached.
+    """
+
+    name: str
+    fetch_query: Callable[[str, dict[str, str] | None], FetchedFeed] | None = None
+    fetch_batch: (
+        Callable[[list[str], dict[str, dict[str, str]]], dict[str, FetchedFeed]] | None
+    ) = None
+    concurrent: bool = False
+
+    def fetch(
+        self,
+        queries: list[str],
+        validators: dict[str, dict[str, str]] | None = None,
+    ) -> dict[str, FetchedFeed]:
+        if not queries:
+            return {}
+        validators = validators or {}
+
+        started = time.perf_counter()
+        if self.fetch_batch is not None:
+            feeds = self.fetch_batch(queries, validators)
+        elif self.concurrent:
+            feeds = _fetch_concurrently(self.fetch_query, queries, validators)
+        else:
+            feeds = _fetch_sequentially(self.fetch_query, queries, validators)
+        print(
+            f"Fetched news for {len(feeds)}/{len(queries)} queries "
+            f"from {self.name} in {time.perf_counter() - started:.2f}s."
+        )
+        return feeds
+
+
+_NEWS_PROVIDERS: dict[str, NewsProvider] = {}
+
+
+def register_news_provider(provider: NewsProvider) -> None:
+    _NEWS_PROVIDERS[provider.name] = provider
+
+
+def get_news_provider(name: str) -> NewsProvider:
+    provider = _NEWS_PROVIDERS.get(name)
+    if provider is None:
+        raise NewsConfigError(
+            f"Unsupported NEWS_PROVIDER '{name}'. "
+            f"Use one of: {', '.join(sorted(_NEWS_PROVIDERS))}."
+        )
+    return provider
+
+
+def _fetch_concurrently(
+    fetch_query: Callable[[str, dict[str, str] | None], FetchedFeed],
+    queries: list[str],
+    validators: dict[str, dict[str, str]],
+) -> dict[str, FetchedFeed]:
+    """Fetch queries on a bounded pool, giving up on any still running at the deadline.
+
+    Failed and timed-out queries are left out of the result, so they stay
+    uncached and are retried next run.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(config.NEWS_FETCH_WORKERS, len(queries))),
+        thread_name_prefix="news-fetch",
+    )
+    futures = {
+        executor.submit(fetch_query, query, validators.get(query)): query
+        for query in queries
+    }
+    done, not_done = wait(futures, timeout=config.NEWS_FETCH_DEADLINE_SECONDS)
+    # Don't wait for stragglers; each is bounded by the request timeout anyway.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    feeds = {}
+    for future in done:
+        query = futures[future]
+        try:
+            feeds[query] = future.result()
+        except Exception as e:
+            print(f"News fetch failed for '{query}': {e}")
+    for future in not_done:
+        print(
+            f"News fetch for '{futures[future]}' missed the "
+            f"{config.NEWS_FETCH_DEADLINE_SECONDS:g}s deadline."
+        )
+    return feeds
+
+
+def _fetch_sequentially(
+    fetch_query: Callable[[str, dict[str, str] | None], FetchedFeed],
+    queries: list[str],
+    validators: dict[str, dict[str, str]],
+) -> dict[str, FetchedFeed]:
+    deadline = time.monotonic() + config.NEWS_FETCH_DEADLINE_SECONDS
+    feeds = {}
+    for query in queries:
+        if time.monotonic() >= deadline:
+            print(
+                f"News fetch for '{query}' missed the "
+                f"{config.NEWS_FETCH_DEADLINE_SECONDS:g}s deadline."
+            )
+            continue
+        try:
+            feeds[query] = fetch_query(query, validators.get(query))
+        except Exception as e:
+            print(f"News fetch failed for '{query}': {e}")
+    return feeds
+
+
+def _session():
+    """Return the process-wide HTTP session, so feeds reuse pooled connections."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=max(1, config.NEWS_FETCH_WORKERS)
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _http_session = session
+        return _http_session
+
+
+def _fetch_google_news_rss(
+    query: str, validators: dict[str, str] | None = None
+) -> FetchedFeed:
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = _session().get(
+        GOOGLE_NEWS_RSS_URL,
+        params={
             "q": query,
             "hl": "en-US",
             "gl": "US",
             "ceid": "US:en",
-        }
+        },
+        headers=headers,
+        timeout=config.NEWS_FETCH_TIMEOUT_SECONDS,
+        stream=True,
     )
-    url = f"https://news.google.com/rss/search?{encoded_query}"
-    request = urllib.request.Request(
-        url,
-        headers={"User-Agent": "wsbreporter/0.1 (+https://github.com/)"},
+    feed = FetchedFeed(
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
     )
-    with urllib.request.urlopen(request, timeout=15) as response:
-        xml_bytes = response.read()
+    try:
+        if response.status_code == 304:
+            feed.not_modified = True
+        else:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            feed.items = _parse_rss_items(
+                response.raw, query, config.NEWS_ITEMS_PER_TERM, "google-news-rss"
+            )
+        # Drain what the parser skipped so the connection goes back to the pool.
+        response.raw.drain_conn()
+        response.raw.release_conn()
+    finally:
+        response.close()
+    return feed
 
-    root = ET.fromstring(xml_bytes)
+
+def _parse_rss_items(
+    stream, query: str, limit: int | None, provider: str
+) -> list[dict[str, Any]]:
+    """Parse RSS items incrementally, stopping once ``limit`` items are read."""
     items = []
-    for item in root.findall("./channel/item"):
-        title = _clean_text(item.findtext("title"))
-        link = _clean_text(item.findtext("link"))
-        if not title or not link:
+    for _, element in ET.iterparse(stream, events=("end",)):
+        if element.tag != "item":
+            continue
+        title = _clean_text(element.findtext("title"))
+        link = _clean_text(element.findtext("link"))
+        if title and link:
+            source = element.find("source")
+            items.append(
+                {
+                    "provider": provider,
+                    "query": query,
+                    "title": title,
+                    "url": link,
+                    "source_name": _clean_text(
+                        source.text if source is not None else ""
+                    ),
+                    "published_at": _parse_rss_datetime(element.findtext("pubDate")),
+                    "summary": _clean_text(element.findtext("description")),
+                    "raw": (
+                        ET.tostring(element, encoding="unicode")
+                        if config.NEWS_STORE_RAW
+                        else None
+                    ),
+                }
+            )
+            if limit is not None and len(items) >= limit:
+                break
+        element.clear()
+    return items
+
+
+def _fetch_local_files(query: str, validators: dict[str, str] | None) -> FetchedFeed:
+    """Serve a query from NEWS_LOCAL_DIR, for offline runs and load tests.
+
+    A file named after the query (``nvda-earnings.xml``, ``.rss`` or
+    ``.json``) answers it directly. Otherwise items from every file in the
+    directory are matched against the query's words, best match first.
+    """
+    directory = _local_news_dir()
+    limit = config.NEWS_ITEMS_PER_TERM
+    slug = "-".join(re.findall(r"[a-z0-9]+", query.lower()))
+    for extension in _LOCAL_NEWS_EXTENSIONS:
+        path = os.path.join(directory, slug + extension)
+        if os.path.exists(path):
+            return FetchedFeed(items=_read_local_news_file(path, query, limit))
+
+    query_terms = _terms(query)
+    scored = []
+    for path in sorted(os.listdir(directory)):
+        if not path.endswith(_LOCAL_NEWS_EXTENSIONS):
+            continue
+        for item in _read_local_news_file(os.path.join(directory, path), query):
+            matched = len(
+                query_terms
+                & _terms(f"{item.get('title', '')} {item.get('summary', '')}")
+            )
+            if matched:
+                scored.append((matched, len(scored), item))
+    scored.sort(key=lambda entry: (-entry[0], entry[1]))
+    return FetchedFeed(items=[item for _, _, item in scored[:limit]])
+
+
+def _read_local_news_file(
+    path: str, query: str, limit: int | None = None
+) -> list[dict[str, Any]]:
+    if not path.endswith(".json"):
+        with open(path, "rb") as f:
+            return _parse_rss_items(f, query, limit, "local-files")
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("items", [])
+    items = []
+    for entry in data[:limit]:
+        title = _clean_text(entry.get("title"))
+        url = _clean_text(entry.get("url") or entry.get("link"))
+        if not title or not url:
             continue
-        source = item.find("source")
         items.append(
             {
-                "provider": config.NEWS_PROVIDER,
+                "provider": "local-files",
                 "query": query,
                 "title": title,
-                "url": link,
-                "source_name": _clean_text(source.text if source is not None else ""),
-                "published_at": _parse_rss_datetime(item.findtext("pubDate")),
-                "summary": _clean_text(item.findtext("description")),
-                "raw": ET.tostring(item, encoding="unicode"),
+                "url": url,
+                "source_name": _clean_text(
+                    entry.get("source_name") or entry.get("source")
+                ),
+                "published_at": _parse_rss_datetime(
+                    entry.get("published_at") or entry.get("pubDate")
+                ),
+                "summary": _clean_text(
+                    entry.get("summary") or entry.get("description")
+                ),
+                "raw": json.dumps(entry) if config.NEWS_STORE_RAW else None,
             }
         )
-        if len(items) >= config.NEWS_ITEMS_PER_TERM:
-            break
-
     return items
 
 
+def _local_news_dir() -> str:
+    if os.path.isabs(config.NEWS_LOCAL_DIR):
+        return config.NEWS_LOCAL_DIR
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, config.NEWS_LOCAL_DIR)
+
+
 def _clean_text(value: str | None) -> str:
     if not value:
         return ""
@@ -115,3 +596,9 @@ def _parse_rss_datetime(value: str | None) -> str | None:
             return datetime.fromisoformat(value).isoformat(timespec="seconds")
         except ValueError:
             return value
+
+
+register_news_provider(
+    NewsProvider("google-news-rss", fetch_query=_fetch_google_news_rss, concurrent=True)
+)
+register_news_provider(NewsProvider("local-files", fetch_query=_fetch_local_files))
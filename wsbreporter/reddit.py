@@ -1,4 +1,17 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any
+
 import praw
+from praw.models import MoreComments
+from praw.models.util import stream_generator
+from prawcore.requestor import Requestor
+
 from . import config
 
 
@@ -8,6 +21,7 @@ def fetch_top_posts(
     sort_by="hot",
     skip_pinned=False,
     fetch_comments=True,
+    reddit=None,
 ):
     """
     Fetches posts from the configured subreddit.
@@ -17,88 +31,499 @@ def fetch_top_posts(
         subreddit: Subreddit name to fetch from (default: from config)
         sort_by: How to sort posts - 'hot', 'new', 'top', 'rising' (default: 'hot')
         skip_pinned: Skip pinned/stickied posts like weekly threads (default: False)
+        reddit: Client to fetch with (default: the process-wide client)
 
     Returns:
         list: A list of dictionaries, where each dictionary represents a post
               with its title, body, and top comments.
         None: If an error occurs during fetching.
     """
+    try:
+        return list(
+            iter_top_posts(
+                num_posts=num_posts,
+                subreddit=subreddit,
+                sort_by=sort_by,
+                skip_pinned=skip_pinned,
+                fetch_comments=fetch_comments,
+                reddit=reddit,
+            )
+        )
+    except Exception as e:
+        print(f"Error fetching Reddit posts: {e}")
+        return None
+
+
+def iter_top_posts(
+    num_posts=None,
+    subreddit=None,
+    sort_by="hot",
+    skip_pinned=False,
+    fetch_comments=False,
+    reddit=None,
+    after=None,
+) -> Iterator[dict]:
+    """Yield posts like fetch_top_posts, as each listing page arrives.
+
+    ``after`` is a post fullname to continue the listing after. Errors are
+    raised to the caller instead of being reported.
+    """
     # Use provided arguments or fall back to config defaults
     num_posts = num_posts or config.NUM_POSTS_TO_FETCH
     subreddit = subreddit or config.SUBREDDIT_NAME
+    reddit = reddit or _reddit()
+
+    subreddit_obj = reddit.subreddit(subreddit)
+    yielded = 0
+
+    # Choose the sorting method
+    # Fetch more than needed to account for skipped pinned posts
+    fetch_limit = num_posts * 3 if skip_pinned else num_posts
+    params = {"after": after} if after else None
+
+    if sort_by == "hot":
+        submissions = subreddit_obj.hot(limit=fetch_limit, params=params)
+    elif sort_by == "new":
+        submissions = subreddit_obj.new(limit=fetch_limit, params=params)
+    elif sort_by == "rising":
+        submissions = subreddit_obj.rising(limit=fetch_limit, params=params)
+    else:  # top
+        submissions = subreddit_obj.top(limit=fetch_limit, params=params)
+
+    for submission in submissions:
+        # Skip pinned/stickied posts if requested
+        if skip_pinned and submission.stickied:
+            continue
+
+        # Stop if we've collected enough posts
+        if yielded >= num_posts:
+            break
+
+        post_comments = _fetch_submission_comments(submission) if fetch_comments else []
+
+        yield _submission_to_post(submission, post_comments)
+        yielded += 1
+
+
+def iter_listings(
+    listings: list[dict], workers: int | None = None, chunk_size: int = 100
+) -> Iterator[tuple[str, list[dict] | None]]:
+    """Yield ``(subreddit, posts)`` chunks from several listings as they arrive.
+
+    Each listing is a dict of iter_top_posts arguments (``subreddit``,
+    ``num_posts``, ``sort_by``, ``skip_pinned`` and optionally ``after``),
+    fetched without comments on the same worker pool and rate-limit budget as
+    comment fetches. Chunks hold up to ``chunk_size`` posts (a listing page).
+    A listing that fails is reported and yields ``(subreddit, None)``.
+    At most ``workers`` listings are fetched at once.
+    """
+    chunks: queue.Queue = queue.Queue()
+    pool = _worker_pool()
+    pending = iter(listings)
+    running = 0
+    for listing in itertools.islice(pending, workers or config.REDDIT_COMMENT_WORKERS):
+        pool.submit(_stream_listing, listing, chunk_size, chunks)
+        running += 1
+
+    while running:
+        chunk = chunks.get()
+        if chunk is not None:
+            yield chunk
+            continue
+        running -= 1
+        listing = next(pending, None)
+        if listing is not None:
+            pool.submit(_stream_listing, listing, chunk_size, chunks)
+            running += 1
+
+
+def _stream_listing(listing: dict, chunk_size: int, chunks: queue.Queue) -> None:
+    subreddit = listing["subreddit"]
+    chunk = []
+    try:
+        for post in iter_top_posts(**listing, reddit=_worker_reddit()):
+            chunk.append(post)
+            if len(chunk) >= chunk_size:
+                chunks.put((subreddit, chunk))
+                chunk = []
+        if chunk:
+            chunks.put((subreddit, chunk))
+    except Exception as e:
+        print(f"Error fetching Reddit posts from r/{subreddit}: {e}")
+        chunks.put((subreddit, None))
+    finally:
+        # Marks this listing as done.
+        chunks.put(None)
+
+
+def fetch_post_snapshots(post_ids: list[str]) -> list[dict] | None:
+    """Re-poll current score, ratio and comment count for known posts.
+
+    Uses Reddit's info endpoint, which answers up to 100 posts per request,
+    instead of a listing plus one request per post. Comments are not
+    fetched. Posts Reddit no longer returns are left out.
+    """
     try:
         reddit = _reddit()
+        return [
+            _submission_to_post(submission)
+            for submission in reddit.info(
+                fullnames=[f"t3_{post_id}" for post_id in post_ids]
+            )
+        ]
+    except Exception as e:
+        print(f"Error fetching Reddit post snapshots: {e}")
+        return None
+
+
+def _submission_to_post(submission, comments: list[dict] | None = None) -> dict:
+    return {
+        "reddit_id": submission.id,
+        "title": submission.title,
+        "selftext": submission.selftext,
+        "url": submission.url,
+        "author": str(submission.author) if submission.author else None,
+        "score": submission.score,
+        "upvote_ratio": submission.upvote_ratio,
+        "num_comments": submission.num_comments,
+        "created_utc": str(submission.created_utc),
+        "comments": comments or [],
+        "is_pinned": submission.stickied,  # Mark if it's a pinned post
+    }
+
+
+def fetch_comments_for_posts(
+    post_ids: list[str],
+    workers: int | None = None,
+    on_comments: Callable[[str, list[dict]], None] | None = None,
+    known_comments: dict[str, dict[str, Any]] | None = None,
+) -> dict[str, list[dict]]:
+    """Fetch top comments for each post, several posts at a time.
+
+    Every worker shares the process's rate-limit budget. A post that fails
+    is reported and left out of the result without affecting the others.
+    ``on_comments(post_id, comments)`` is called from the calling thread as
+    each post finishes, so results can be stored without waiting for the
+    whole batch.
+
+    Posts listed in ``known_comments`` (post id to the stored comment
+    ``ids`` and ``newest_created_utc``) only fetch comments newer than the
+    ones already stored.
+    """
+    comments_by_post = {}
+    for post_id, comments in iter_post_comments(post_ids, workers, known_comments):
+        comments_by_post[post_id] = comments
+        if on_comments is not None:
+            on_comments(post_id, comments)
+    return comments_by_post
+
+
+def iter_post_comments(
+    post_ids: list[str],
+    workers: int | None = None,
+    known_comments: dict[str, dict[str, Any]] | None = None,
+) -> Iterator[tuple[str, list[dict]]]:
+    """Yield ``(post_id, comments)`` as each post's fetch finishes.
+
+    Takes the same arguments as fetch_comments_for_posts. Posts that fail
+    are reported and skipped.
+    """
+    workers = workers or config.REDDIT_COMMENT_WORKERS
+    known_comments = known_comments or {}
 
-        subreddit_obj = reddit.subreddit(subreddit)
-        posts_data = []
-
-        # Choose the sorting method
-        # Fetch more than needed to account for skipped pinned posts
-        fetch_limit = num_posts * 3 if skip_pinned else num_posts
-
-        if sort_by == "hot":
-            submissions = subreddit_obj.hot(limit=fetch_limit)
-        elif sort_by == "new":
-            submissions = subreddit_obj.new(limit=fetch_limit)
-        elif sort_by == "rising":
-            submissions = subreddit_obj.rising(limit=fetch_limit)
-        else:  # top
-            submissions = subreddit_obj.top(limit=fetch_limit)
-
-        for submission in submissions:
-            # Skip pinned/stickied posts if requested
-            if skip_pinned and submission.stickied:
+    if workers <= 1 or len(post_ids) <= 1:
+        for post_id in post_ids:
+            try:
+                comments = _fetch_post_comments(
+                    post_id, known_comments.get(post_id), _reddit()
+                )
+            except Exception as e:
+                print(f"Error fetching Reddit comments for post {post_id}: {e}")
                 continue
+            yield post_id, comments
+        return
 
-            # Stop if we've collected enough posts
-            if len(posts_data) >= num_posts:
-                break
+    # Keep at most ``workers`` posts in flight on the shared pool, submitting
+    # the next one as each finishes.
+    pool = _worker_pool()
+    pending = iter(post_ids)
+    futures = {}
+    for post_id in itertools.islice(pending, workers):
+        futures[
+            pool.submit(_fetch_post_comments, post_id, known_comments.get(post_id))
+        ] = post_id
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            post_id = futures.pop(future)
+            next_id = next(pending, None)
+            if next_id is not None:
+                futures[
+                    pool.submit(
+                        _fetch_post_comments, next_id, known_comments.get(next_id)
+                    )
+                ] = next_id
+            try:
+                comments = future.result()
+            except Exception as e:
+                print(f"Error fetching Reddit comments for post {post_id}: {e}")
+                continue
+            yield post_id, comments
 
-            post_comments = (
-                _fetch_submission_comments(submission) if fetch_comments else []
-            )
 
-            posts_data.append(
-                {
-                    "reddit_id": submission.id,
-                    "title": submission.title,
-                    "selftext": submission.selftext,
-                    "url": submission.url,
-                    "author": str(submission.author) if submission.author else None,
-                    "score": submission.score,
-                    "upvote_ratio": submission.upvote_ratio,
-                    "num_comments": submission.num_comments,
-                    "created_utc": str(submission.created_utc),
-                    "comments": post_comments,
-                    "is_pinned": submission.stickied,  # Mark if it's a pinned post
-                }
+def fetch_comment_scores(comment_ids: list[str]) -> list[dict] | None:
+    """Re-poll known comments through the info endpoint, 100 per request.
+
+    Much lighter than reloading each post's comment tree when only scores
+    have moved. Each comment carries its ``post_reddit_id``.
+    """
+    try:
+        reddit = _reddit()
+        return [
+            dict(_comment_to_dict(comment), post_reddit_id=comment.link_id[3:])
+            for comment in reddit.info(
+                fullnames=[f"t1_{comment_id}" for comment_id in comment_ids]
             )
-        return posts_data
+        ]
     except Exception as e:
-        print(f"Error fetching Reddit posts: {e}")
+        print(f"Error refreshing Reddit comment scores: {e}")
         return None
 
 
-def fetch_comments_for_posts(post_ids: list[str]) -> dict[str, list[dict]]:
-    try:
-        reddit = _reddit()
-        comments_by_post = {}
+def stream_subreddit(
+    kind: str, subreddit: str | None = None, continue_after_id: str | None = None
+) -> Iterator[dict | None]:
+    """Yield a subreddit's new posts or comments as they arrive, oldest first.
 
-        for post_id in post_ids:
-            submission = reddit.submission(id=post_id)
-            comments_by_post[post_id] = _fetch_submission_comments(submission)
+    ``kind`` is "submissions" or "comments". Each item carries its
+    ``fullname``, and comments their ``post_reddit_id``. ``None`` is yielded
+    after every poll that found nothing new, so the caller can stop or wait.
+    With ``continue_after_id`` (a fullname) the stream resumes after that
+    item. Errors are reported and retried with backoff.
+    """
+    subreddit_obj = _worker_reddit().subreddit(subreddit or config.SUBREDDIT_NAME)
+    listing = subreddit_obj.new if kind == "submissions" else subreddit_obj.comments
 
-        return comments_by_post
-    except Exception as e:
-        print(f"Error fetching Reddit comments: {e}")
-        return {}
+    def report(error: Exception) -> None:
+        print(f"Error reading Reddit {kind} stream, retrying: {error}")
+
+    while True:
+        empty_polls = 0
+        for item in stream_generator(
+            listing,
+            pause_after=0,
+            continue_after_id=continue_after_id,
+            exception_handler=report,
+        ):
+            if item is None:
+                empty_polls += 1
+                # Reddit returns nothing before a deleted or removed item, so
+                # a resume point that disappeared would stall the stream.
+                if continue_after_id and empty_polls >= 3:
+                    print(
+                        f"Nothing new after {continue_after_id} in the {kind} "
+                        "stream; restarting from the latest items."
+                    )
+                    continue_after_id = None
+                    break
+                yield None
+                continue
+
+            continue_after_id = None
+            if kind == "submissions":
+                yield dict(_submission_to_post(item), fullname=item.fullname)
+            else:
+                yield dict(
+                    _comment_to_dict(item),
+                    post_reddit_id=item.link_id[3:],
+                    fullname=item.fullname,
+                )
+
+
+def _fetch_post_comments(
+    post_id: str, known: dict[str, Any] | None = None, reddit=None
+) -> list[dict]:
+    submission = (reddit or _worker_reddit()).submission(id=post_id)
+    if known:
+        return _fetch_new_submission_comments(
+            submission, known["ids"], known.get("newest_created_utc")
+        )
+    if config.COMMENT_EXPANSION:
+        return _expand_submission_comments(submission)
+    return _fetch_submission_comments(submission)
+
+
+def rate_limit_metrics() -> dict[str, Any]:
+    """Return request, wait and throttling counters for this process."""
+    return _scheduler.metrics()
+
+
+def print_rate_limit_metrics() -> None:
+    metrics = rate_limit_metrics()
+    remaining = metrics["remaining"]
+    print(
+        f"Reddit API: {metrics['requests']} requests, "
+        f"waited {metrics['wait_seconds']:.1f}s over {metrics['waits']} waits, "
+        f"{metrics['throttled']} throttled"
+        + (f", {remaining:g} remaining" if remaining is not None else "")
+        + "."
+    )
+
+
+class RateLimitScheduler:
+    """Pace Reddit API requests from the rate-limit headers of each response.
+
+    Reddit reports the requests left in the current window and the seconds
+    until it resets. While more than ``burst`` requests remain, requests go
+    out immediately; below that the rest are spaced evenly over the time left,
+    so the quota runs out as the window resets and never before. One scheduler
+    is shared by every client and thread in the process.
+    """
+
+    def __init__(self, burst: int = 10):
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._remaining = None
+        self._reset_at = None
+        self._next_slot = 0.0
+        self._in_flight = 0
+        self._requests = 0
+        self._throttled = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+
+    def acquire(self) -> None:
+        """Block until the next request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            if self._reset_at is not None and now >= self._reset_at:
+                # A new window; the next response reports its quota.
+                self._remaining = None
+                self._reset_at = None
+
+            slot = max(now, self._next_slot)
+            if self._remaining is not None:
+                if self._remaining <= 0:
+                    slot = max(slot, self._reset_at)
+                elif self._remaining <= self.burst:
+                    interval = max(self._reset_at - slot, 0.0) / self._remaining
+                    self._next_slot = slot + interval
+                self._remaining -= 1
+
+            self._in_flight += 1
+            self._requests += 1
+            delay = slot - now
+            if delay > 0:
+                self._waits += 1
+                self._wait_seconds += delay
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, headers: Mapping[str, str], status_code: int) -> None:
+        """Record the quota reported by a response."""
+        with self._lock:
+            self._in_flight = max(self._in_flight - 1, 0)
+            now = time.monotonic()
+            if status_code == 429:
+                self._throttled += 1
+
+            if "x-ratelimit-remaining" in headers:
+                # Requests already sent but not yet answered will use quota too.
+                self._remaining = (
+                    float(headers["x-ratelimit-remaining"]) - self._in_flight
+                )
+                self._reset_at = now + float(headers.get("x-ratelimit-reset", 0))
+            if status_code == 429:
+                retry_after = float(headers.get("retry-after") or 0)
+                self._remaining = 0
+                self._reset_at = max(self._reset_at or now, now + retry_after)
+
+    def release(self) -> None:
+        """Forget a request that failed before any response came back."""
+        with self._lock:
+            self._in_flight = max(self._in_flight - 1, 0)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "waits": self._waits,
+                "wait_seconds": self._wait_seconds,
+                "remaining": self._remaining,
+                "reset_in": (
+                    max(self._reset_at - time.monotonic(), 0.0)
+                    if self._reset_at is not None
+                    else None
+                ),
+            }
+
+
+class _ScheduledRequestor(Requestor):
+    """prawcore requestor that sends every API call through the scheduler."""
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any):
+        # Token requests go to www.reddit.com and don't count against the quota.
+        if not url.startswith(self.oauth_url):
+            return super().request(method, url, *args, **kwargs)
+
+        _scheduler.acquire()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            _scheduler.release()
+            raise
+        _scheduler.update(response.headers, response.status_code)
+        return response
+
+
+_scheduler = RateLimitScheduler(burst=config.REDDIT_RATE_LIMIT_BURST)
+_client = None
+_client_lock = threading.Lock()
+_worker_local = threading.local()
+_pool = None
 
 
 def _reddit():
+    """Return the process-wide Reddit client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _new_reddit()
+        return _client
+
+
+def _worker_reddit():
+    # praw objects are not thread-safe, so each pool thread keeps its own
+    # client. All of them pace through the same scheduler.
+    client = getattr(_worker_local, "client", None)
+    if client is None:
+        client = _worker_local.client = _new_reddit()
+    return client
+
+
+def _worker_pool() -> ThreadPoolExecutor:
+    """Return the shared fetch pool, kept alive so worker clients are reused.
+
+    It is sized once at SCRAPE_MAX_WORKERS; callers limit their own
+    concurrency by how many tasks they keep submitted.
+    """
+    global _pool
+    with _client_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=config.SCRAPE_MAX_WORKERS, thread_name_prefix="reddit-fetch"
+            )
+        return _pool
+
+
+def _new_reddit():
     return praw.Reddit(
         client_id=config.REDDIT_CLIENT_ID,
         client_secret=config.REDDIT_CLIENT_SECRET,
         user_agent=config.REDDIT_USER_AGENT,
+        requestor_class=_ScheduledRequestor,
     )
 
 
@@ -109,20 +534,149 @@ def _fetch_submission_comments(submission) -> list[dict]:
         if i >= config.NUM_COMMENTS_TO_FETCH:
             break
         if hasattr(comment, "body"):
-            comment_link = f"https://www.reddit.com{comment.permalink}"
-            post_comments.append(
-                {
-                    "reddit_id": comment.id,
-                    "body": comment.body,
-                    "url": comment_link,
-                    "author": str(comment.author) if comment.author else None,
-                    "score": comment.score,
-                    "created_utc": str(comment.created_utc),
-                }
-            )
+            post_comments.append(_comment_to_dict(comment))
     return post_comments
 
 
+def _fetch_new_submission_comments(
+    submission, known_ids: set[str], newest_created_utc: float | None
+) -> list[dict]:
+    """Fetch only top-level comments posted since the stored ones.
+
+    Comments are read newest first and reading stops at the first one that
+    is already stored or older than the newest stored comment.
+    """
+    submission.comment_sort = "new"
+    submission.comment_limit = config.NUM_COMMENTS_TO_FETCH
+    submission.comments.replace_more(limit=0)
+    new_comments = []
+    for comment in submission.comments:
+        # Stickied comments sit on top whatever the sort, so they can't
+        # mark where the new comments end.
+        if not hasattr(comment, "body") or getattr(comment, "stickied", False):
+            continue
+        if comment.id in known_ids or (
+            newest_created_utc is not None and comment.created_utc < newest_created_utc
+        ):
+            break
+        new_comments.append(_comment_to_dict(comment))
+    return new_comments
+
+
+def _expand_submission_comments(
+    submission,
+    max_requests: int | None = None,
+    max_depth: int | None = None,
+    deadline_seconds: float | None = None,
+) -> list[dict]:
+    """Walk a post's reply tree, expanding "load more" stubs within budgets.
+
+    Stubs under the highest-scoring comments are expanded first, and the walk
+    stops once ``max_requests`` expansions were made or ``deadline_seconds``
+    passed. Replies deeper than ``max_depth`` (top level is 0) are skipped.
+    """
+    if max_requests is None:
+        max_requests = config.COMMENT_EXPANSION_MAX_REQUESTS
+    if max_depth is None:
+        max_depth = config.COMMENT_EXPANSION_MAX_DEPTH
+    if deadline_seconds is None:
+        deadline_seconds = config.COMMENT_EXPANSION_DEADLINE_SECONDS
+    deadline = time.monotonic() + deadline_seconds
+
+    comments = []
+    depths = {}
+    scores = {}
+    # Max-heap of (priority, size) with an insertion counter to break ties.
+    stubs = []
+    order = itertools.count()
+    skipped = 0
+
+    def push_stub(stub: MoreComments) -> None:
+        nonlocal skipped
+        parent_id = stub.parent_id.split("_", 1)[-1]
+        if stub.parent_id.startswith("t1_"):
+            if depths.get(parent_id, max_depth) >= max_depth:
+                skipped += stub.count
+                return
+            priority = scores[parent_id]
+        else:
+            # More top-level comments rank below every loaded top-level one.
+            top_level = [scores[c["reddit_id"]] for c in comments if c["depth"] == 0]
+            priority = min(top_level, default=0)
+        heapq.heappush(stubs, (-priority, -stub.count, next(order), stub))
+
+    def visit(items) -> None:
+        nonlocal skipped
+        for item in items:
+            if isinstance(item, MoreComments):
+                push_stub(item)
+                continue
+            if not hasattr(item, "body"):
+                continue
+            parent_id = item.parent_id.split("_", 1)[-1]
+            if item.parent_id.startswith("t1_"):
+                depth = (
+                    depths[parent_id] + 1
+                    if parent_id in depths
+                    else vars(item).get("depth") or 0
+                )
+            else:
+                depth = 0
+            if depth > max_depth:
+                skipped += 1
+                continue
+            depths[item.id] = depth
+            scores[item.id] = item.score
+            comments.append(dict(_comment_to_dict(item), depth=depth))
+            visit(getattr(item, "replies", None) or [])
+
+    visit(submission.comments)
+
+    requests_made = 0
+    stopped_by = None
+    while stubs:
+        if requests_made >= max_requests:
+            stopped_by = "request budget"
+            break
+        if time.monotonic() >= deadline:
+            stopped_by = "deadline"
+            break
+        stub = heapq.heappop(stubs)[-1]
+        requests_made += 1
+        try:
+            visit(stub.comments())
+        except Exception as e:
+            print(f"Error expanding comments for post {submission.id}: {e}")
+
+    left = sum(stub.count for *_, stub in stubs)
+    total = submission.num_comments or 0
+    coverage = f"{len(comments) / total:.0%}" if total else "n/a"
+    print(
+        f"Post {submission.id}: collected {len(comments)}/{total} comments "
+        f"({coverage}) with {requests_made} expansion requests; "
+        f"{len(stubs)} stubs ({left} comments) left"
+        + (f", stopped by {stopped_by}" if stopped_by else "")
+        + (f", {skipped} below depth {max_depth}" if skipped else "")
+        + "."
+    )
+    return comments
+
+
+def _comment_to_dict(comment) -> dict:
+    return {
+        "reddit_id": comment.id,
+        "body": comment.body,
+        "url": f"https://www.reddit.com{comment.permalink}",
+        "author": str(comment.author) if comment.author else None,
+        "score": comment.score,
+        "created_utc": str(comment.created_utc),
+        "parent_id": comment.parent_id,
+        # Read from the loaded data: comments from the info endpoint carry no
+        # depth, and a plain attribute lookup would fetch them again.
+        "depth": vars(comment).get("depth"),
+    }
+
+
 if __name__ == "__main__":
     import argparse
 
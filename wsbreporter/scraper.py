@@ -1,7 +1,11 @@
+import tomllib
+
 from . import config
 from . import reddit
 from . import storage
 
+SORT_CHOICES = ("hot", "new", "top", "rising")
+
 
 def scrape_posts(
     num_posts: int | None = None,
@@ -9,53 +13,441 @@ def scrape_posts(
     sort_by: str = "hot",
     skip_pinned: bool = False,
 ) -> list[dict] | None:
-    num_posts = num_posts or config.NUM_POSTS_TO_FETCH
     subreddit = subreddit or config.SUBREDDIT_NAME
+    saved = scrape_subreddits(
+        [
+            {
+                "subreddit": subreddit,
+                "num_posts": num_posts or config.NUM_POSTS_TO_FETCH,
+                "sort_by": sort_by,
+                "skip_pinned": skip_pinned,
+            }
+        ]
+    )
+    return saved.get(subreddit) if saved else None
 
+
+def scrape_subreddits(listings: list[dict]) -> dict[str, list[dict]] | None:
+    """Scrape several subreddits in one pass, returning saved posts by subreddit.
+
+    Each listing holds fetch_top_posts arguments (``subreddit``, ``num_posts``,
+    ``sort_by``, ``skip_pinned``). Listings and comments are fetched on one
+    worker pool sharing one rate-limit budget. Results are written by a
+    background writer as they arrive: posts one listing page at a time and
+    comments COMMENT_WRITE_BATCH_POSTS posts at a time, so fetching and
+    writing overlap and a failed scrape keeps what it already fetched.
+    The run's progress is checkpointed along the way for resume_scrape.
+    """
     if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET:
         print("Error: Please set your Reddit API keys in .env before scraping.")
         return None
 
-    sort_label = sort_by if sort_by != "hot" else "hot (trending)"
-    skip_label = " (skipping pinned)" if skip_pinned else ""
-    print(f"Fetching {num_posts} {sort_label} posts from r/{subreddit}{skip_label}...")
+    run_id = storage.start_scrape_run(listings)
+    return _scrape_run(run_id, listings)
+
 
-    posts = reddit.fetch_top_posts(
-        num_posts=num_posts,
-        subreddit=subreddit,
-        sort_by=sort_by,
-        skip_pinned=skip_pinned,
-        fetch_comments=False,
+def resume_scrape() -> dict[str, list[dict]] | None:
+    """Continue the last scrape run if it did not finish.
+
+    Each listing continues after its last saved page, and only posts whose
+    comments were not saved yet have them fetched.
+    """
+    if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET:
+        print("Error: Please set your Reddit API keys in .env before scraping.")
+        return None
+
+    run = storage.latest_scrape_run()
+    if run is None or run["status"] == "completed":
+        print("No unfinished scrape run to resume.")
+        return None
+
+    print(
+        f"Resuming scrape run {run['id']} started at {run['started_at']} "
+        f"({run['status']}" + (f": {run['error']}" if run["error"] else "") + ")..."
+    )
+    return _scrape_run(
+        run["id"], run["listings"], run["progress"], run["pending_comments"]
     )
 
-    if not posts:
+
+def _scrape_run(
+    run_id: int,
+    listings: list[dict],
+    progress: dict[str, dict] | None = None,
+    pending_comments: dict[str, bool] | None = None,
+) -> dict[str, list[dict]] | None:
+    progress = progress or {}
+    # Posts still needing comments, mapped to whether their refresh is
+    # incremental.
+    pending_comments = dict(pending_comments or {})
+    to_fetch = []
+    for listing in listings:
+        state = progress.get(listing["subreddit"], {})
+        remaining = listing["num_posts"] - state.get("fetched", 0)
+        if state.get("done") or remaining <= 0:
+            print(f"Already fetched the r/{listing['subreddit']} listing.")
+            continue
+        sort_label = (
+            listing["sort_by"] if listing["sort_by"] != "hot" else "hot (trending)"
+        )
+        skip_label = " (skipping pinned)" if listing["skip_pinned"] else ""
+        resume_label = f", continuing after {state['after']}" if state else ""
         print(
-            "Failed to fetch Reddit posts. Please check your network connection or API credentials."
+            f"Fetching {remaining} {sort_label} posts from "
+            f"r/{listing['subreddit']}{skip_label}{resume_label}..."
         )
-        return None
+        to_fetch.append(dict(listing, num_posts=remaining, after=state.get("after")))
 
-    post_ids = [post["reddit_id"] for post in posts if post.get("reddit_id")]
-    existing_ids = storage.existing_post_ids(post_ids)
-    new_ids = set(post_ids) - existing_ids
-    stale_ids = storage.posts_needing_comment_refresh(
-        list(existing_ids), config.COMMENT_REFRESH_HOURS
+    workers = min(
+        config.REDDIT_COMMENT_WORKERS * len(listings), config.SCRAPE_MAX_WORKERS
     )
-    comment_refresh_ids = new_ids | stale_ids
+    storage.set_scrape_run_status(run_id, "running")
+    try:
+        saved_by_subreddit, failed, missing_comments = _fetch_and_save(
+            run_id, to_fetch, pending_comments, workers
+        )
+    except (Exception, KeyboardInterrupt) as e:
+        storage.set_scrape_run_status(run_id, "failed", str(e) or type(e).__name__)
+        print(f"Scrape run {run_id} stopped. Continue it with --resume.")
+        raise
 
-    if comment_refresh_ids:
-        print(
-            f"Refreshing comments for {len(comment_refresh_ids)} new or stale posts..."
+    if failed or missing_comments:
+        storage.set_scrape_run_status(
+            run_id,
+            "failed",
+            f"{len(failed)} listings failed, {missing_comments} posts missing comments",
         )
-        comments_by_post = reddit.fetch_comments_for_posts(
-            sorted(comment_refresh_ids)
+        print(
+            f"Scrape run {run_id} is incomplete ({len(failed)} listings failed, "
+            f"{missing_comments} posts missing comments). Continue it with --resume."
         )
-        for post in posts:
-            post["comments"] = comments_by_post.get(post.get("reddit_id"), [])
     else:
-        print("All stored comments are fresh. Skipping comment refresh.")
+        storage.set_scrape_run_status(run_id, "completed")
+
+    reddit.print_rate_limit_metrics()
+    return saved_by_subreddit
+
+
+def _fetch_and_save(
+    run_id: int,
+    listings: list[dict],
+    pending_comments: dict[str, bool],
+    workers: int,
+) -> tuple[dict[str, list[dict]] | None, set[str], int]:
+    """Fetch and save listings, then comments.
 
-    print(f"Successfully fetched {len(posts)} posts. Saving scrape data to SQLite...")
-    return storage.save_posts(posts, subreddit)
+    Returns the saved posts by subreddit, the subreddits whose listing failed
+    and how many posts are still missing their comments.
+    """
+    fetched_count = 0
+    failed = set()
+    num_comments = {}
+    post_writes = []
+    saved_comments = {}
+    with storage.BackgroundWriter() as writer:
+        for subreddit, posts in reddit.iter_listings(listings, workers=workers):
+            if posts is None:
+                print(
+                    f"Failed to fetch Reddit posts from r/{subreddit}. Please check "
+                    "your network connection or API credentials."
+                )
+                failed.add(subreddit)
+                continue
+
+            post_ids = [post["reddit_id"] for post in posts if post.get("reddit_id")]
+            num_comments.update(
+                (post["reddit_id"], post.get("num_comments")) for post in posts
+            )
+            existing_ids = storage.existing_post_ids(post_ids)
+            stale_ids = storage.posts_needing_comment_refresh(
+                list(existing_ids),
+                config.COMMENT_REFRESH_HOURS,
+                num_comments=num_comments,
+            )
+            comment_posts = {
+                post_id: post_id in stale_ids
+                for post_id in post_ids
+                if post_id not in existing_ids or post_id in stale_ids
+            }
+            pending_comments.update(comment_posts)
+            # Comments are saved separately as each post's fetch finishes.
+            for post in posts:
+                post["comments"] = []
+                post["comments_fetched"] = False
+            stats = {}
+            post_writes.append(
+                (
+                    writer.submit(
+                        storage.save_subreddit_posts,
+                        {subreddit: posts},
+                        stats=stats,
+                        # Resume after this page once it is saved.
+                        scrape_progress={
+                            "run_id": run_id,
+                            "subreddit": subreddit,
+                            "after": f"t3_{posts[-1]['reddit_id']}",
+                            "fetched": len(posts),
+                            "comment_posts": comment_posts,
+                        },
+                    ),
+                    stats,
+                )
+            )
+            fetched_count += len(posts)
+
+        saved_by_subreddit = {}
+        saved_rows = 0
+        save_seconds = 0.0
+        for write, stats in post_writes:
+            for subreddit, saved_posts in write.result().items():
+                saved_by_subreddit.setdefault(subreddit, []).extend(saved_posts)
+            saved_rows += stats.get("rows", 0)
+            save_seconds += stats.get("seconds", 0.0)
+        for listing in listings:
+            if listing["subreddit"] not in failed:
+                writer.submit(
+                    storage.save_scrape_progress,
+                    run_id,
+                    listing["subreddit"],
+                    done=True,
+                )
+
+        if not fetched_count and not pending_comments:
+            return None, failed, 0
+        if fetched_count:
+            print(
+                f"Successfully fetched {fetched_count} posts. Saved {saved_rows} "
+                f"rows in {save_seconds:.2f}s "
+                f"({saved_rows / max(save_seconds, 1e-9):,.0f} rows/s)."
+            )
+
+        if pending_comments:
+            print(
+                f"Refreshing comments for {len(pending_comments)} new or stale "
+                "posts..."
+            )
+            saved_comments = refresh_comments(
+                sorted(pending_comments),
+                num_comments=num_comments,
+                incremental_ids={
+                    post_id
+                    for post_id, incremental in pending_comments.items()
+                    if incremental
+                },
+                workers=workers,
+                writer=writer,
+                run_id=run_id,
+            )
+        else:
+            print("All stored comments are fresh. Skipping comment refresh.")
+
+    for saved_posts in saved_by_subreddit.values():
+        for post in saved_posts:
+            if post["reddit_id"] in saved_comments:
+                post["comments"] = saved_comments[post["reddit_id"]]
+
+    print(
+        f"SQLite writes took {writer.busy_seconds:.2f}s in the background; "
+        f"fetching waited {writer.blocked_seconds:.2f}s on them."
+    )
+    return saved_by_subreddit, failed, len(set(pending_comments) - set(saved_comments))
+
+
+def refresh_comments(
+    post_ids: list[str],
+    num_comments: dict[str, int | None] | None = None,
+    incremental_ids: set[str] | None = None,
+    workers: int | None = None,
+    writer: storage.BackgroundWriter | None = None,
+    run_id: int | None = None,
+) -> dict[str, list[dict]]:
+    """Fetch and save comments for ``post_ids``, returning them by post.
+
+    Posts in ``incremental_ids`` only fetch comments newer than the stored
+    ones (with COMMENT_REFRESH_INCREMENTAL); the rest are fetched in full.
+    Finished posts are handed to ``writer`` (a new one if not given)
+    COMMENT_WRITE_BATCH_POSTS at a time, and marked done for scrape run
+    ``run_id`` if given.
+    """
+    num_comments = num_comments or {}
+    known_comments = {}
+    refreshed_by_post = {}
+    if config.COMMENT_REFRESH_INCREMENTAL and incremental_ids:
+        known_comments = storage.stored_comment_state(sorted(incremental_ids))
+        refreshed_by_post = _refresh_known_comment_scores(known_comments)
+
+    own_writer = writer is None
+    writer = writer or storage.BackgroundWriter()
+    writes = []
+    pending = {}
+
+    def flush() -> None:
+        writes.append(
+            writer.submit(
+                storage.save_comment_batch,
+                dict(pending),
+                num_comments,
+                scrape_run_id=run_id,
+            )
+        )
+        pending.clear()
+
+    try:
+        for post_id, comments in reddit.iter_post_comments(
+            post_ids, workers=workers, known_comments=known_comments
+        ):
+            pending[post_id] = comments + refreshed_by_post.get(post_id, [])
+            if len(pending) >= config.COMMENT_WRITE_BATCH_POSTS:
+                flush()
+    finally:
+        if pending:
+            flush()
+        if own_writer:
+            writer.close()
+
+    saved_comments = {}
+    for write in writes:
+        saved_comments.update(write.result())
+    print(f"Saved comments for {len(saved_comments)}/{len(post_ids)} posts.")
+    # Incremental posts only saved their new and re-polled comments, so
+    # read their full comment lists back.
+    saved_comments.update(
+        (post["reddit_id"], post["comments"])
+        for post in storage.load_posts(
+            [post_id for post_id in saved_comments if post_id in known_comments]
+        )
+    )
+    return saved_comments
+
+
+def _refresh_known_comment_scores(
+    known_comments: dict[str, dict],
+) -> dict[str, list[dict]]:
+    """Re-poll every stored comment of incremental posts, grouped by post.
+
+    All of them are re-polled, not just the ones with high stored scores, so
+    a comment that was low when stored can still climb into the report.
+    """
+    comment_ids = [
+        comment_id
+        for state in known_comments.values()
+        for comment_id in sorted(state["ids"])
+    ]
+    if not comment_ids:
+        return {}
+
+    refreshed = reddit.fetch_comment_scores(comment_ids) or []
+    refreshed_by_post = {}
+    for comment in refreshed:
+        refreshed_by_post.setdefault(comment.pop("post_reddit_id"), []).append(comment)
+    print(
+        f"Re-polled {len(refreshed)}/{len(comment_ids)} stored comments across "
+        f"{len(known_comments)} posts."
+    )
+    return refreshed_by_post
+
+
+def refresh_post_snapshots(
+    subreddit: str | None = None,
+    track_hours: float | None = None,
+    limit: int | None = None,
+) -> list[dict] | None:
+    """Take a new score snapshot of every tracked post, without comments.
+
+    Tracked posts are the ones scraped within ``track_hours``. They are
+    re-polled 100 at a time, so hundreds of posts cost a handful of requests.
+    """
+    subreddit = subreddit or config.SUBREDDIT_NAME
+    track_hours = track_hours or config.SNAPSHOT_TRACK_HOURS
+
+    if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET:
+        print("Error: Please set your Reddit API keys in .env before scraping.")
+        return None
+
+    post_ids = storage.tracked_post_ids(subreddit, track_hours, limit)
+    if not post_ids:
+        print(f"No posts from r/{subreddit} scraped in the last {track_hours:g}h.")
+        return []
+
+    print(f"Refreshing snapshots for {len(post_ids)} tracked posts...")
+    posts = reddit.fetch_post_snapshots(post_ids)
+    if posts is None:
+        return None
+
+    for post in posts:
+        post["comments_fetched"] = False
+    saved_posts = storage.save_posts(posts, subreddit, include_stored_comments=False)
+    print(f"Refreshed {len(saved_posts)}/{len(post_ids)} tracked posts.")
+    reddit.print_rate_limit_metrics()
+    return saved_posts
+
+
+def parse_subreddit_listings(
+    text: str, num_posts: int, sort_by: str = "hot", skip_pinned: bool = False
+) -> list[dict]:
+    """Parse comma-separated ``name[:sort[:posts]]`` entries into listings.
+
+    Sort and post count default to ``sort_by`` and ``num_posts``.
+    """
+    entries = []
+    for entry in text.split(","):
+        if not entry.strip():
+            continue
+        name, sort, posts = (entry.strip().split(":") + [None, None])[:3]
+        entries.append({"name": name, "sort": sort or None, "posts": posts or None})
+    return _build_listings(entries, num_posts, sort_by, skip_pinned)
+
+
+def load_subreddit_listings(
+    path: str, num_posts: int, sort_by: str = "hot", skip_pinned: bool = False
+) -> list[dict]:
+    """Read listings from the ``[[subreddits]]`` tables of a TOML file.
+
+    Each table has a ``name`` and optionally ``sort``, ``posts`` and
+    ``skip_pinned``; missing values fall back to the given defaults.
+    """
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    return _build_listings(data.get("subreddits", []), num_posts, sort_by, skip_pinned)
+
+
+def _build_listings(
+    entries: list[dict], num_posts: int, sort_by: str, skip_pinned: bool
+) -> list[dict]:
+    listings = []
+    seen = set()
+    for entry in entries:
+        name = str(entry.get("name") or "").strip().removeprefix("r/")
+        if not name:
+            raise ValueError("Every subreddit entry needs a name.")
+        if name.lower() in seen:
+            raise ValueError(f"r/{name} is listed more than once.")
+        seen.add(name.lower())
+
+        sort = entry.get("sort") or sort_by
+        if sort not in SORT_CHOICES:
+            raise ValueError(
+                f"Unknown sort {sort!r} for r/{name}. Use one of: "
+                f"{', '.join(SORT_CHOICES)}."
+            )
+        try:
+            posts = int(entry.get("posts") or num_posts)
+        except ValueError:
+            raise ValueError(f"Post count for r/{name} must be a number.") from None
+        if posts <= 0:
+            raise ValueError(f"Post count for r/{name} must be positive.")
+
+        listings.append(
+            {
+                "subreddit": name,
+                "num_posts": posts,
+                "sort_by": sort,
+                "skip_pinned": bool(entry.get("skip_pinned", skip_pinned)),
+            }
+        )
+    if not listings:
+        raise ValueError("No subreddits given.")
+    return listings
 
 
 def main() -> None:
@@ -79,7 +471,7 @@ def main() -> None:
     parser.add_argument(
         "--sort",
         type=str,
-        choices=["hot", "new", "top", "rising"],
+        choices=SORT_CHOICES,
         default="hot",
         help="How to sort posts: hot, new, top, rising (default: hot)",
     )
@@ -88,7 +480,77 @@ def main() -> None:
         action="store_true",
         help="Skip pinned/stickied posts like weekly threads",
     )
+    parser.add_argument(
+        "--subreddits",
+        type=str,
+        help="Scrape several subreddits in one run, comma-separated as "
+        "name[:sort[:posts]] (e.g. wallstreetbets,stocks:new:50)",
+    )
+    parser.add_argument(
+        "--subreddits-file",
+        type=str,
+        help="Read the subreddits to scrape from the [[subreddits]] tables of "
+        "a TOML file",
+    )
+    parser.add_argument(
+        "--snapshot-only",
+        action="store_true",
+        help="Only re-poll scores of already tracked posts (no listing, no comments)",
+    )
+    parser.add_argument(
+        "--track-hours",
+        type=float,
+        default=config.SNAPSHOT_TRACK_HOURS,
+        help="With --snapshot-only, re-poll posts scraped within this many hours "
+        f"(default: {config.SNAPSHOT_TRACK_HOURS:g})",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the last scrape run where it stopped, with its original "
+        "subreddits and options",
+    )
     args = parser.parse_args()
+    if args.resume and args.snapshot_only:
+        parser.error("--resume cannot be combined with --snapshot-only")
+
+    listings = None
+    try:
+        if args.subreddits_file:
+            listings = load_subreddit_listings(
+                args.subreddits_file, args.posts, args.sort, args.skip_pinned
+            )
+        elif args.subreddits:
+            listings = parse_subreddit_listings(
+                args.subreddits, args.posts, args.sort, args.skip_pinned
+            )
+    except (OSError, tomllib.TOMLDecodeError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.snapshot_only:
+        subreddits = (
+            [listing["subreddit"] for listing in listings]
+            if listings
+            else [args.subreddit]
+        )
+        for subreddit in subreddits:
+            posts = refresh_post_snapshots(
+                subreddit=subreddit, track_hours=args.track_hours
+            )
+            if posts is None:
+                return
+        print("Snapshot refresh complete.")
+        return
+
+    if args.resume:
+        if resume_scrape() is not None:
+            print("Scrape complete.")
+        return
+
+    if listings:
+        if scrape_subreddits(listings):
+            print("Scrape complete.")
+        return
 
     posts = scrape_posts(
         num_posts=args.posts,
@@ -0,0 +1,114 @@
+import sqlite3
+
+from . import storage
+
+
+def search(
+    query: str,
+    kinds: tuple[str, ...] = ("posts", "comments", "reports"),
+    subreddit: str | None = None,
+    limit: int = 20,
+    raw_query: bool = False,
+) -> list[dict]:
+    return storage.search_text(
+        query, kinds=kinds, subreddit=subreddit, limit=limit, raw_query=raw_query
+    )
+
+
+def format_result(result: dict) -> str:
+    lines = [f"[{result['kind']}] {result.get('title') or ''}".rstrip()]
+    details = []
+    if result.get("subreddit"):
+        details.append(f"r/{result['subreddit']}")
+    if result.get("author"):
+        details.append(f"u/{result['author']}")
+    if result.get("created_utc"):
+        details.append(str(result["created_utc"]))
+    # bm25() is lower-is-better; flip it so larger means more relevant.
+    details.append(f"relevance {-result['rank']:.2f}")
+    lines.append("  " + " | ".join(details))
+    snippet = " ".join((result.get("snippet") or "").split())
+    if snippet:
+        lines.append(f"  {snippet}")
+    if result.get("url"):
+        lines.append(f"  {result['url']}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Full-text search stored posts, comments and reports"
+    )
+    parser.add_argument("query", nargs="?", help="Words or phrase to search for")
+    parser.add_argument(
+        "-k",
+        "--kind",
+        action="append",
+        choices=["posts", "comments", "reports"],
+        help="Limit results to this kind (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "-s",
+        "--subreddit",
+        type=str,
+        help="Only return results from this subreddit",
+    )
+    parser.add_argument(
+        "-n",
+        "--limit",
+        type=int,
+        default=20,
+        help="Maximum number of results (default: 20)",
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Pass the query through as FTS5 syntax (e.g. 'NEAR(NVDA earnings, 5)')",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild the full-text index from the stored tables",
+    )
+    args = parser.parse_args()
+
+    if args.rebuild:
+        counts = storage.rebuild_search_index()
+        print(
+            f"Indexed {counts['posts']} posts, {counts['comments']} comments "
+            f"and {counts['reports']} reports."
+        )
+        if not args.query:
+            return
+
+    if not args.query:
+        parser.error("a query is required unless --rebuild is given")
+
+    try:
+        results = search(
+            args.query,
+            kinds=tuple(args.kind or ("posts", "comments", "reports")),
+            subreddit=args.subreddit,
+            limit=args.limit,
+            raw_query=args.raw,
+        )
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return
+    except sqlite3.OperationalError as e:
+        print(f"Invalid search query '{args.query}': {e}")
+        return
+
+    if not results:
+        print(f"No matches for '{args.query}'.")
+        return
+
+    for result in results:
+        print(format_result(result))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,286 +1,1233 @@
+import json
 import os
+import queue
 import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 from . import config
 
+_local = threading.local()
+_connections_lock = threading.Lock()
+_open_connections: list[sqlite3.Connection] = []
+_initialized_paths: set[str] = set()
+_generation = 0
+
 
 def init_db() -> None:
-    with _connect() as conn:
-        conn.executescript(
-            """
-            PRAGMA foreign_keys = ON;
-
-            CREATE TABLE IF NOT EXISTS posts (
-                reddit_id TEXT PRIMARY KEY,
-                subreddit TEXT NOT NULL,
-                title TEXT NOT NULL,
-                selftext TEXT,
-                url TEXT NOT NULL,
-                author TEXT,
-                created_utc TEXT,
-                first_scraped_at TEXT NOT NULL,
-                last_scraped_at TEXT NOT NULL
-            );
+    _connect()
 
-            CREATE TABLE IF NOT EXISTS comments (
-                reddit_id TEXT PRIMARY KEY,
-                post_reddit_id TEXT NOT NULL,
-                body TEXT NOT NULL,
-                author TEXT,
-                url TEXT,
-                created_utc TEXT,
-                first_scraped_at TEXT NOT NULL,
-                last_scraped_at TEXT NOT NULL,
-
-                FOREIGN KEY (post_reddit_id) REFERENCES posts(reddit_id)
-            );
 
-            CREATE TABLE IF NOT EXISTS post_snapshots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                post_reddit_id TEXT NOT NULL,
-                scraped_at TEXT NOT NULL,
-                score INTEGER,
-                upvote_ratio REAL,
-                num_comments INTEGER,
-                is_pinned INTEGER NOT NULL DEFAULT 0,
+def close_db() -> None:
+    """Close every connection opened by this process.
 
-                FOREIGN KEY (post_reddit_id) REFERENCES posts(reddit_id)
-            );
+    Threads that touch storage afterwards transparently reconnect.
+    """
+    global _generation
+    with _connections_lock:
+        for conn in _open_connections:
+            conn.close()
+        _open_connections.clear()
+        _initialized_paths.clear()
+        _generation += 1
 
-            CREATE TABLE IF NOT EXISTS comment_snapshots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                comment_reddit_id TEXT NOT NULL,
-                scraped_at TEXT NOT NULL,
-                score INTEGER,
 
-                FOREIGN KEY (comment_reddit_id) REFERENCES comments(reddit_id)
-            );
+class BackgroundWriter:
+    """Run storage writes on one background thread, in the order submitted.
 
-            CREATE TABLE IF NOT EXISTS reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                report_date TEXT NOT NULL,
-                subreddit TEXT NOT NULL,
-                llm_provider TEXT NOT NULL,
-                llm_model TEXT NOT NULL,
-                markdown TEXT NOT NULL,
-                generated_at TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS news_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                provider TEXT NOT NULL,
-                query TEXT NOT NULL,
-                title TEXT NOT NULL,
-                url TEXT NOT NULL,
-                source_name TEXT,
-                published_at TEXT,
-                summary TEXT,
-                fetched_at TEXT NOT NULL,
-                raw TEXT,
-
-                UNIQUE(provider, query, url)
-            );
+    Lets a scrape keep fetching while earlier results are written. Writes wait
+    on a bounded queue of ``max_pending`` jobs, so a producer that outruns
+    SQLite blocks instead of buffering without limit. ``submit`` returns a
+    Future for the write's result; ``close`` waits for every queued write.
+    """
 
-            CREATE TABLE IF NOT EXISTS report_news_items (
-                report_id INTEGER NOT NULL,
-                news_item_id INTEGER NOT NULL,
-                query TEXT NOT NULL,
-                included_at TEXT NOT NULL,
-
-                PRIMARY KEY (report_id, news_item_id, query),
-                FOREIGN KEY (report_id) REFERENCES reports(id),
-                FOREIGN KEY (news_item_id) REFERENCES news_items(id)
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_posts_subreddit_last_scraped
-            ON posts(subreddit, last_scraped_at);
-
-            CREATE INDEX IF NOT EXISTS idx_comments_post
-            ON comments(post_reddit_id);
-
-            CREATE INDEX IF NOT EXISTS idx_post_snapshots_post_time
-            ON post_snapshots(post_reddit_id, scraped_at);
+    def __init__(self, max_pending: int | None = None):
+        self._jobs: queue.Queue = queue.Queue(
+            maxsize=max_pending or config.WRITE_QUEUE_SIZE
+        )
+        self.blocked_seconds = 0.0
+        self.busy_seconds = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="storage-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, write: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        started = time.perf_counter()
+        self._jobs.put((future, write, args, kwargs))
+        self.blocked_seconds += time.perf_counter() - started
+        return future
+
+    def close(self) -> None:
+        self._jobs.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        try:
+            while (job := self._jobs.get()) is not None:
+                future, write, args, kwargs = job
+                started = time.perf_counter()
+                try:
+                    future.set_result(write(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+                self.busy_seconds += time.perf_counter() - started
+        finally:
+            _close_thread_connections()
+
+
+def _migration_initial_schema(conn: sqlite3.Connection) -> None:
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            reddit_id TEXT PRIMARY KEY,
+            subreddit TEXT NOT NULL,
+            title TEXT NOT NULL,
+            selftext TEXT,
+            url TEXT NOT NULL,
+            author TEXT,
+            created_utc TEXT,
+            first_scraped_at TEXT NOT NULL,
+            last_scraped_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS comments (
+            reddit_id TEXT PRIMARY KEY,
+            post_reddit_id TEXT NOT NULL,
+            body TEXT NOT NULL,
+            author TEXT,
+            url TEXT,
+            created_utc TEXT,
+            first_scraped_at TEXT NOT NULL,
+            last_scraped_at TEXT NOT NULL,
+
+            FOREIGN KEY (post_reddit_id) REFERENCES posts(reddit_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS post_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_reddit_id TEXT NOT NULL,
+            scraped_at TEXT NOT NULL,
+            score INTEGER,
+            upvote_ratio REAL,
+            num_comments INTEGER,
+            is_pinned INTEGER NOT NULL DEFAULT 0,
+
+            FOREIGN KEY (post_reddit_id) REFERENCES posts(reddit_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS comment_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            comment_reddit_id TEXT NOT NULL,
+            scraped_at TEXT NOT NULL,
+            score INTEGER,
+
+            FOREIGN KEY (comment_reddit_id) REFERENCES comments(reddit_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_date TEXT NOT NULL,
+            subreddit TEXT NOT NULL,
+            llm_provider TEXT NOT NULL,
+            llm_model TEXT NOT NULL,
+            markdown TEXT NOT NULL,
+            generated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS news_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            provider TEXT NOT NULL,
+            query TEXT NOT NULL,
+            title TEXT NOT NULL,
+            url TEXT NOT NULL,
+            source_name TEXT,
+            published_at TEXT,
+            summary TEXT,
+            fetched_at TEXT NOT NULL,
+            raw TEXT,
+
+            UNIQUE(provider, query, url)
+        );
+
+        CREATE TABLE IF NOT EXISTS report_news_items (
+            report_id INTEGER NOT NULL,
+            news_item_id INTEGER NOT NULL,
+            query TEXT NOT NULL,
+            included_at TEXT NOT NULL,
+
+            PRIMARY KEY (report_id, news_item_id, query),
+            FOREIGN KEY (report_id) REFERENCES reports(id),
+            FOREIGN KEY (news_item_id) REFERENCES news_items(id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_posts_subreddit_last_scraped
+        ON posts(subreddit, last_scraped_at);
+
+        CREATE INDEX IF NOT EXISTS idx_comments_post
+        ON comments(post_reddit_id);
+
+        CREATE INDEX IF NOT EXISTS idx_post_snapshots_post_time
+        ON post_snapshots(post_reddit_id, scraped_at);
+
+        CREATE INDEX IF NOT EXISTS idx_comment_snapshots_comment_time
+        ON comment_snapshots(comment_reddit_id, scraped_at);
+
+        CREATE INDEX IF NOT EXISTS idx_reports_date_subreddit
+        ON reports(report_date, subreddit);
+
+        CREATE INDEX IF NOT EXISTS idx_news_items_query_fetched
+        ON news_items(provider, query, fetched_at);
+
+        CREATE INDEX IF NOT EXISTS idx_report_news_items_report
+        ON report_news_items(report_id);
+        """,
+    )
+
+
+def _migration_snapshot_runs(conn: sqlite3.Connection) -> None:
+    # Snapshots are stored as runs: scraped_at is when a set of values was
+    # first seen and valid_to is the last scrape that still saw them.
+    _ensure_column(conn, "post_snapshots", "valid_to", "TEXT")
+    _ensure_column(conn, "comment_snapshots", "valid_to", "TEXT")
+
+
+def _migration_latest_snapshots(conn: sqlite3.Connection) -> None:
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS post_latest (
+            post_reddit_id TEXT PRIMARY KEY,
+            scraped_at TEXT NOT NULL,
+            valid_from TEXT,
+            score INTEGER,
+            upvote_ratio REAL,
+            num_comments INTEGER,
+            is_pinned INTEGER NOT NULL DEFAULT 0,
+
+            FOREIGN KEY (post_reddit_id) REFERENCES posts(reddit_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS comment_latest (
+            comment_reddit_id TEXT PRIMARY KEY,
+            scraped_at TEXT NOT NULL,
+            valid_from TEXT,
+            score INTEGER,
+
+            FOREIGN KEY (comment_reddit_id) REFERENCES comments(reddit_id)
+        );
+        """,
+    )
+    _ensure_column(conn, "post_latest", "valid_from", "TEXT")
+    _ensure_column(conn, "comment_latest", "valid_from", "TEXT")
+    _rebuild_latest_snapshots(conn)
+
+
+def _migration_snapshot_rollups(conn: sqlite3.Connection) -> None:
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS post_snapshot_rollups (
+            post_reddit_id TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            first_scraped_at TEXT NOT NULL,
+            last_scraped_at TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            first_score INTEGER,
+            last_score INTEGER,
+            min_score INTEGER,
+            max_score INTEGER,
+            first_num_comments INTEGER,
+            last_num_comments INTEGER,
+            min_num_comments INTEGER,
+            max_num_comments INTEGER,
+            first_upvote_ratio REAL,
+            last_upvote_ratio REAL,
+            min_upvote_ratio REAL,
+            max_upvote_ratio REAL,
+
+            PRIMARY KEY (post_reddit_id, resolution, bucket_start),
+            FOREIGN KEY (post_reddit_id) REFERENCES posts(reddit_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS comment_snapshot_rollups (
+            comment_reddit_id TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            first_scraped_at TEXT NOT NULL,
+            last_scraped_at TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            first_score INTEGER,
+            last_score INTEGER,
+            min_score INTEGER,
+            max_score INTEGER,
+
+            PRIMARY KEY (comment_reddit_id, resolution, bucket_start),
+            FOREIGN KEY (comment_reddit_id) REFERENCES comments(reddit_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS snapshot_rollup_state (
+            name TEXT PRIMARY KEY,
+            rolled_up_to TEXT NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_post_snapshots_time
+        ON post_snapshots(scraped_at);
+
+        CREATE INDEX IF NOT EXISTS idx_comment_snapshots_time
+        ON comment_snapshots(scraped_at);
+
+        CREATE INDEX IF NOT EXISTS idx_post_snapshot_rollups_bucket
+        ON post_snapshot_rollups(resolution, bucket_start);
+
+        CREATE INDEX IF NOT EXISTS idx_comment_snapshot_rollups_bucket
+        ON comment_snapshot_rollups(resolution, bucket_start);
+        """,
+    )
+
+
+def _migration_comment_freshness(conn: sqlite3.Connection) -> None:
+    # Per-post comment freshness, so refresh checks never scan comments.
+    added_seen_count = _ensure_column(conn, "posts", "comments_seen_count", "INTEGER")
+    if _ensure_column(conn, "posts", "comments_scraped_at", "TEXT"):
+        conn.execute(
+            """
+            UPDATE posts
+            SET comments_scraped_at = (
+                SELECT MAX(last_scraped_at)
+                FROM comments
+                WHERE post_reddit_id = posts.reddit_id
+            )
+            """
+        )
+    if added_seen_count:
+        # The comment count the post had when its comments were last fetched,
+        # so COMMENT_REFRESH_REQUIRE_GROWTH works before posts are refetched.
+        conn.execute(
+            """
+            UPDATE posts
+            SET comments_seen_count = (
+                SELECT num_comments
+                FROM post_snapshots
+                WHERE post_reddit_id = posts.reddit_id
+                  AND scraped_at <= posts.comments_scraped_at
+                ORDER BY scraped_at DESC, id DESC
+                LIMIT 1
+            )
+            WHERE comments_scraped_at IS NOT NULL
+            """
+        )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_posts_comments_scraped
+        ON posts(comments_scraped_at)
+        """
+    )
 
-            CREATE INDEX IF NOT EXISTS idx_comment_snapshots_comment_time
-            ON comment_snapshots(comment_reddit_id, scraped_at);
 
-            CREATE INDEX IF NOT EXISTS idx_reports_date_subreddit
-            ON reports(report_date, subreddit);
+def _migration_search_index(conn: sqlite3.Connection) -> None:
+    if not _fts5_available(conn):
+        # rebuild_search_index() creates the index later if FTS5 shows up.
+        return
+    _create_search_index(conn)
+    _rebuild_search_index(conn)
 
-            CREATE INDEX IF NOT EXISTS idx_news_items_query_fetched
-            ON news_items(provider, query, fetched_at);
 
-            CREATE INDEX IF NOT EXISTS idx_report_news_items_report
-            ON report_news_items(report_id);
-            """
+def _migration_export_state(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS export_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            exported_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _migration_news_cache(conn: sqlite3.Connection) -> None:
+    # One row per cached query, so a query that returned no items is still a
+    # cache hit. feed_rank keeps cached items in the order the feed gave them.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS news_fetches (
+            provider TEXT NOT NULL,
+            query TEXT NOT NULL,
+            fetched_at TEXT NOT NULL,
+            item_count INTEGER NOT NULL,
+
+            PRIMARY KEY (provider, query)
+        )
+        """
+    )
+    _ensure_column(conn, "news_items", "feed_rank", "INTEGER")
+
+
+def _migration_news_validators(conn: sqlite3.Connection) -> None:
+    # HTTP validators from the last fetch, sent back as a conditional GET.
+    _ensure_column(conn, "news_fetches", "etag", "TEXT")
+    _ensure_column(conn, "news_fetches", "last_modified", "TEXT")
+
+
+def _migration_comment_tree(conn: sqlite3.Connection) -> None:
+    # Where each comment sits in its thread, for expanded reply trees.
+    _ensure_column(conn, "comments", "parent_id", "TEXT")
+    _ensure_column(conn, "comments", "depth", "INTEGER")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_comments_parent
+        ON comments(parent_id)
+        """
+    )
+
+
+def _migration_stream_state(conn: sqlite3.Connection) -> None:
+    # Newest item each ingest stream has stored, to resume after a restart.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stream_state (
+            name TEXT PRIMARY KEY,
+            last_id TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _migration_scrape_runs(conn: sqlite3.Connection) -> None:
+    # Progress of each scrape run, so a failed run can be resumed: where each
+    # listing stopped and which posts still need their comments fetched.
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            listings TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            error TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS scrape_run_listings (
+            run_id INTEGER NOT NULL,
+            subreddit TEXT NOT NULL,
+            after TEXT,
+            fetched INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+
+            PRIMARY KEY (run_id, subreddit),
+            FOREIGN KEY (run_id) REFERENCES scrape_runs(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS scrape_run_posts (
+            run_id INTEGER NOT NULL,
+            reddit_id TEXT NOT NULL,
+            incremental INTEGER NOT NULL DEFAULT 0,
+            comments_done INTEGER NOT NULL DEFAULT 0,
+
+            PRIMARY KEY (run_id, reddit_id),
+            FOREIGN KEY (run_id) REFERENCES scrape_runs(id) ON DELETE CASCADE
+        );
+        """,
+    )
+
+
+def _migration_snapshot_scrapes(conn: sqlite3.Connection) -> None:
+    # How many scrapes saw each run, so rollups count scrapes, not rows.
+    # Older runs only tell whether they were seen more than once.
+    for table in ("post_snapshots", "comment_snapshots"):
+        if _ensure_column(conn, table, "scrapes", "INTEGER NOT NULL DEFAULT 1"):
+            conn.execute(f"UPDATE {table} SET scrapes = 2 WHERE valid_to > scraped_at")
+
+
+def _migration_snapshot_valid_to_index(conn: sqlite3.Connection) -> None:
+    # Lets incremental exports find every run extended since the last export.
+    _execute_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS idx_post_snapshots_valid_to
+        ON post_snapshots(valid_to);
+
+        CREATE INDEX IF NOT EXISTS idx_comment_snapshots_valid_to
+        ON comment_snapshots(valid_to);
+        """,
+    )
+
+
+# Schema migrations, applied in order. A database's PRAGMA user_version is the
+# number of the last migration applied to it. Append new migrations; never
+# renumber or edit ones that have shipped. Every migration must also be safe to
+# run against databases created before versioning, which have user_version 0
+# but may already contain some of these tables and columns.
+_MIGRATIONS = [
+    (1, "initial schema", _migration_initial_schema),
+    (2, "run-length snapshot intervals", _migration_snapshot_runs),
+    (3, "latest snapshot tables", _migration_latest_snapshots),
+    (4, "snapshot rollups", _migration_snapshot_rollups),
+    (5, "per-post comment freshness", _migration_comment_freshness),
+    (6, "full-text search index", _migration_search_index),
+    (7, "export watermarks", _migration_export_state),
+    (8, "news query cache", _migration_news_cache),
+    (9, "news conditional GET validators", _migration_news_validators),
+    (10, "comment parent and depth", _migration_comment_tree),
+    (11, "stream ingest cursors", _migration_stream_state),
+    (12, "resumable scrape runs", _migration_scrape_runs),
+    (13, "snapshot scrape counts", _migration_snapshot_scrapes),
+    (14, "snapshot valid_to index", _migration_snapshot_valid_to_index),
+]
+
+
+def schema_version() -> tuple[int, int]:
+    """Return (current, latest) schema versions without applying anything."""
+    conn = _open_connection(_database_path())
+    try:
+        return _user_version(conn), _MIGRATIONS[-1][0]
+    finally:
+        conn.close()
+
+
+def pending_migrations() -> list[tuple[int, str]]:
+    current, _ = schema_version()
+    return [
+        (version, description)
+        for version, description, _ in _MIGRATIONS
+        if version > current
+    ]
+
+
+def migrate() -> list[tuple[int, str]]:
+    """Apply pending migrations and return the ones that ran."""
+    conn = _open_connection(_database_path())
+    try:
+        return _migrate(conn)
+    finally:
+        conn.close()
+
+
+def _migrate(conn: sqlite3.Connection) -> list[tuple[int, str]]:
+    latest = _MIGRATIONS[-1][0]
+    current = _user_version(conn)
+    if current > latest:
+        raise RuntimeError(
+            f"Database schema version {current} is newer than this code "
+            f"supports ({latest}). Upgrade wsbreporter."
         )
 
-
-def save_posts(posts: list[dict[str, Any]], subreddit: str) -> list[dict[str, Any]]:
+    applied = []
+    for version, description, apply in _MIGRATIONS:
+        if version <= current:
+            continue
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock.
+            if _user_version(conn) >= version:
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        applied.append((version, description))
+    return applied
+
+
+def _user_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """Run a multi-statement script inside the caller's transaction.
+
+    Unlike executescript(), this does not commit first, so migrations stay
+    atomic.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+_UPSERT_POST_SQL = """
+    INSERT INTO posts (
+        reddit_id, subreddit, title, selftext, url, author, created_utc,
+        first_scraped_at, last_scraped_at, comments_scraped_at, comments_seen_count
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(reddit_id) DO UPDATE SET
+        subreddit = excluded.subreddit,
+        title = excluded.title,
+        selftext = excluded.selftext,
+        url = excluded.url,
+        author = excluded.author,
+        created_utc = excluded.created_utc,
+        last_scraped_at = excluded.last_scraped_at,
+        comments_scraped_at = COALESCE(
+            excluded.comments_scraped_at, posts.comments_scraped_at
+        ),
+        comments_seen_count = CASE
+            WHEN excluded.comments_scraped_at IS NULL
+            THEN posts.comments_seen_count
+            ELSE excluded.comments_seen_count
+        END
+"""
+
+# A post's snapshot run continues while score, ratio, comment count and pinned
+# state all match its latest values.
+_POST_UNCHANGED_SQL = """
+    SELECT valid_from
+    FROM post_latest
+    WHERE post_reddit_id = :post_id
+      AND score IS :score
+      AND upvote_ratio IS :upvote_ratio
+      AND num_comments IS :num_comments
+      AND is_pinned = :is_pinned
+"""
+
+_EXTEND_POST_SNAPSHOT_SQL = f"""
+    UPDATE post_snapshots
+    SET valid_to = :scraped_at,
+        scrapes = scrapes + (valid_to IS NOT :scraped_at)
+    WHERE post_reddit_id = :post_id
+      AND scraped_at = ({_POST_UNCHANGED_SQL})
+"""
+
+_INSERT_POST_SNAPSHOT_SQL = f"""
+    INSERT INTO post_snapshots (
+        post_reddit_id, scraped_at, valid_to, score, upvote_ratio, num_comments,
+        is_pinned
+    )
+    SELECT
+        :post_id, :scraped_at, :scraped_at, :score, :upvote_ratio, :num_comments,
+        :is_pinned
+    WHERE NOT EXISTS ({_POST_UNCHANGED_SQL})
+"""
+
+_UPSERT_COMMENT_SQL = """
+    INSERT INTO comments (
+        reddit_id, post_reddit_id, body, author, url, created_utc,
+        first_scraped_at, last_scraped_at, parent_id, depth
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(reddit_id) DO UPDATE SET
+        post_reddit_id = excluded.post_reddit_id,
+        body = excluded.body,
+        author = excluded.author,
+        url = excluded.url,
+        created_utc = excluded.created_utc,
+        last_scraped_at = excluded.last_scraped_at,
+        parent_id = COALESCE(excluded.parent_id, comments.parent_id),
+        depth = COALESCE(excluded.depth, comments.depth)
+"""
+
+_COMMENT_UNCHANGED_SQL = """
+    SELECT valid_from
+    FROM comment_latest
+    WHERE comment_reddit_id = :comment_id
+      AND score IS :score
+"""
+
+_EXTEND_COMMENT_SNAPSHOT_SQL = f"""
+    UPDATE comment_snapshots
+    SET valid_to = :scraped_at,
+        scrapes = scrapes + (valid_to IS NOT :scraped_at)
+    WHERE comment_reddit_id = :comment_id
+      AND scraped_at = ({_COMMENT_UNCHANGED_SQL})
+"""
+
+_INSERT_COMMENT_SNAPSHOT_SQL = f"""
+    INSERT INTO comment_snapshots (comment_reddit_id, scraped_at, valid_to, score)
+    SELECT :comment_id, :scraped_at, :scraped_at, :score
+    WHERE NOT EXISTS ({_COMMENT_UNCHANGED_SQL})
+"""
+
+_UPSERT_POST_LATEST_SQL = """
+    INSERT INTO post_latest (
+        post_reddit_id, scraped_at, valid_from, score, upvote_ratio, num_comments,
+        is_pinned
+    )
+    VALUES (
+        :post_id, :scraped_at, :scraped_at, :score, :upvote_ratio, :num_comments,
+        :is_pinned
+    )
+    ON CONFLICT(post_reddit_id) DO UPDATE SET
+        valid_from = CASE
+            WHEN post_latest.score IS excluded.score
+                AND post_latest.upvote_ratio IS excluded.upvote_ratio
+                AND post_latest.num_comments IS excluded.num_comments
+                AND post_latest.is_pinned = excluded.is_pinned
+            THEN post_latest.valid_from
+            ELSE excluded.valid_from
+        END,
+        scraped_at = excluded.scraped_at,
+        score = excluded.score,
+        upvote_ratio = excluded.upvote_ratio,
+        num_comments = excluded.num_comments,
+        is_pinned = excluded.is_pinned
+    WHERE excluded.scraped_at >= post_latest.scraped_at
+"""
+
+_UPSERT_COMMENT_LATEST_SQL = """
+    INSERT INTO comment_latest (comment_reddit_id, scraped_at, valid_from, score)
+    VALUES (:comment_id, :scraped_at, :scraped_at, :score)
+    ON CONFLICT(comment_reddit_id) DO UPDATE SET
+        valid_from = CASE
+            WHEN comment_latest.score IS excluded.score
+            THEN comment_latest.valid_from
+            ELSE excluded.valid_from
+        END,
+        scraped_at = excluded.scraped_at,
+        score = excluded.score
+    WHERE excluded.scraped_at >= comment_latest.scraped_at
+"""
+
+
+def save_posts(
+    posts: list[dict[str, Any]],
+    subreddit: str,
+    include_stored_comments: bool = True,
+    stats: dict[str, Any] | None = None,
+) -> list[dict[str, Any]]:
+    """Upsert posts, comments and their snapshots in one transaction.
+
+    Rows are written with executemany batches and the saved posts are built
+    from the input rather than read back. Posts passed without comments keep
+    the comments already stored for them, which are loaded into the result
+    unless ``include_stored_comments`` is false. A ``stats`` dict is filled
+    with the ``rows``, ``posts`` and ``comments`` written and the ``seconds``
+    it took.
+    """
+    return save_subreddit_posts({subreddit: posts}, include_stored_comments, stats).get(
+        subreddit, []
+    )
+
+
+def save_subreddit_posts(
+    posts_by_subreddit: dict[str, list[dict[str, Any]]],
+    include_stored_comments: bool = True,
+    stats: dict[str, Any] | None = None,
+    scrape_progress: dict[str, Any] | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    """Save several subreddits' posts like save_posts, in one transaction.
+
+    ``scrape_progress`` holds save_scrape_progress arguments for a checkpoint
+    written in the same transaction, so the saved posts and a scrape run's
+    resume cursor never disagree.
+    """
+    started = time.perf_counter()
     scraped_at = _now_utc()
-    init_db()
 
-    with _connect() as conn:
+    post_rows = []
+    post_snapshot_rows = []
+    comment_rows = []
+    comment_snapshot_rows = []
+    saved_posts = []
+    saved_by_subreddit: dict[str, list[dict[str, Any]]] = {}
+    for subreddit, posts in posts_by_subreddit.items():
+        saved_by_subreddit[subreddit] = []
         for post in posts:
             post_id = post.get("reddit_id")
             if not post_id:
                 continue
 
-            conn.execute(
-                """
-                INSERT INTO posts (
-                    reddit_id, subreddit, title, selftext, url, author, created_utc,
-                    first_scraped_at, last_scraped_at
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(reddit_id) DO UPDATE SET
-                    subreddit = excluded.subreddit,
-                    title = excluded.title,
-                    selftext = excluded.selftext,
-                    url = excluded.url,
-                    author = excluded.author,
-                    created_utc = excluded.created_utc,
-                    last_scraped_at = excluded.last_scraped_at
-                """,
-                (
-                    post_id,
-                    subreddit,
-                    post.get("title", ""),
-                    post.get("selftext", ""),
-                    post.get("url", ""),
-                    post.get("author"),
-                    post.get("created_utc"),
-                    scraped_at,
-                    scraped_at,
-                ),
+            _build_post_rows(post, subreddit, scraped_at, post_rows, post_snapshot_rows)
+            saved_comments = _build_comment_rows(
+                post_id,
+                post.get("comments", []),
+                scraped_at,
+                comment_rows,
+                comment_snapshot_rows,
+            )
+            saved_posts.append(
+                {
+                    "reddit_id": post_id,
+                    "title": post.get("title", ""),
+                    "selftext": post.get("selftext", ""),
+                    "url": post.get("url", ""),
+                    "author": post.get("author"),
+                    "created_utc": post.get("created_utc"),
+                    "first_scraped_at": scraped_at,
+                    "last_scraped_at": scraped_at,
+                    "score": post.get("score"),
+                    "upvote_ratio": post.get("upvote_ratio"),
+                    "num_comments": post.get("num_comments"),
+                    "is_pinned": bool(post.get("is_pinned", False)),
+                    "comments": saved_comments,
+                }
             )
-            conn.execute(
+            saved_by_subreddit[subreddit].append(saved_posts[-1])
+
+    if not saved_posts and scrape_progress is None:
+        return saved_by_subreddit
+
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if scrape_progress is not None:
+            _save_scrape_progress(conn, **scrape_progress)
+        post_ids = [post["reddit_id"] for post in saved_posts]
+        first_scraped_at = _first_scraped_at(conn, post_ids)
+        conn.executemany(_UPSERT_POST_SQL, post_rows)
+        # Unchanged values extend the current snapshot run; changed values
+        # start a new one. Both must run before the latest tables move on.
+        conn.executemany(_EXTEND_POST_SNAPSHOT_SQL, post_snapshot_rows)
+        conn.executemany(_INSERT_POST_SNAPSHOT_SQL, post_snapshot_rows)
+        conn.executemany(_UPSERT_POST_LATEST_SQL, post_snapshot_rows)
+        conn.executemany(_UPSERT_COMMENT_SQL, comment_rows)
+        conn.executemany(_EXTEND_COMMENT_SNAPSHOT_SQL, comment_snapshot_rows)
+        conn.executemany(_INSERT_COMMENT_SNAPSHOT_SQL, comment_snapshot_rows)
+        conn.executemany(_UPSERT_COMMENT_LATEST_SQL, comment_snapshot_rows)
+
+        uncommented_ids = [
+            post["reddit_id"]
+            for post in saved_posts
+            if include_stored_comments and not post["comments"]
+        ]
+        stored_comments = _stored_comments(conn, uncommented_ids)
+
+    for post in saved_posts:
+        post["first_scraped_at"] = first_scraped_at.get(post["reddit_id"], scraped_at)
+        if not post["comments"]:
+            post["comments"] = stored_comments.get(post["reddit_id"], [])
+
+    if stats is not None:
+        stats.update(
+            rows=len(post_rows)
+            + len(post_snapshot_rows)
+            + len(comment_rows)
+            + len(comment_snapshot_rows),
+            posts=len(post_rows),
+            comments=len(comment_rows),
+            seconds=time.perf_counter() - started,
+        )
+    return saved_by_subreddit
+
+
+def save_comments(
+    post_id: str, comments: list[dict[str, Any]], num_comments: int | None = None
+) -> list[dict[str, Any]]:
+    """Upsert one already-saved post's freshly fetched comments.
+
+    Lets comments be stored as each post's fetch finishes instead of waiting
+    for the whole batch. Marks the post's comments as fetched now, with
+    ``num_comments`` as the count seen at that time.
+    """
+    return save_comment_batch({post_id: comments}, {post_id: num_comments})[post_id]
+
+
+def save_comment_batch(
+    comments_by_post: dict[str, list[dict[str, Any]]],
+    num_comments: dict[str, int | None] | None = None,
+    scrape_run_id: int | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    """Save several posts' comments like save_comments, in one transaction.
+
+    With ``scrape_run_id`` the posts are also marked done for that scrape
+    run in the same transaction.
+    """
+    num_comments = num_comments or {}
+    scraped_at = _now_utc()
+    comment_rows = []
+    comment_snapshot_rows = []
+    saved_comments = {
+        post_id: _build_comment_rows(
+            post_id, comments, scraped_at, comment_rows, comment_snapshot_rows
+        )
+        for post_id, comments in comments_by_post.items()
+    }
+
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(_UPSERT_COMMENT_SQL, comment_rows)
+        conn.executemany(_EXTEND_COMMENT_SNAPSHOT_SQL, comment_snapshot_rows)
+        conn.executemany(_INSERT_COMMENT_SNAPSHOT_SQL, comment_snapshot_rows)
+        conn.executemany(_UPSERT_COMMENT_LATEST_SQL, comment_snapshot_rows)
+        conn.executemany(
+            """
+            UPDATE posts
+            SET comments_scraped_at = ?,
+                comments_seen_count = COALESCE(?, comments_seen_count)
+            WHERE reddit_id = ?
+            """,
+            [
+                (scraped_at, num_comments.get(post_id), post_id)
+                for post_id in comments_by_post
+            ],
+        )
+        if scrape_run_id is not None:
+            conn.executemany(
                 """
-                INSERT INTO post_snapshots (
-                    post_reddit_id, scraped_at, score, upvote_ratio, num_comments,
-                    is_pinned
-                )
-                VALUES (?, ?, ?, ?, ?, ?)
+                UPDATE scrape_run_posts
+                SET comments_done = 1
+                WHERE run_id = ? AND reddit_id = ?
                 """,
-                (
-                    post_id,
-                    scraped_at,
-                    post.get("score"),
-                    post.get("upvote_ratio"),
-                    post.get("num_comments"),
-                    int(bool(post.get("is_pinned", False))),
-                ),
+                [(scrape_run_id, post_id) for post_id in comments_by_post],
             )
+    return saved_comments
 
-            for comment in post.get("comments", []):
-                if isinstance(comment, str):
-                    continue
 
-                comment_id = comment.get("reddit_id")
-                if not comment_id:
-                    continue
+def save_stream_batch(
+    subreddit: str,
+    posts: list[dict[str, Any]],
+    comments: list[dict[str, Any]],
+    cursors: dict[str, str],
+) -> dict[str, int]:
+    """Upsert streamed posts and comments and advance stream cursors at once.
 
-                conn.execute(
-                    """
-                    INSERT INTO comments (
-                        reddit_id, post_reddit_id, body, author, url, created_utc,
-                        first_scraped_at, last_scraped_at
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(reddit_id) DO UPDATE SET
-                        post_reddit_id = excluded.post_reddit_id,
-                        body = excluded.body,
-                        author = excluded.author,
-                        url = excluded.url,
-                        created_utc = excluded.created_utc,
-                        last_scraped_at = excluded.last_scraped_at
-                    """,
-                    (
-                        comment_id,
-                        post_id,
-                        comment.get("body", ""),
-                        comment.get("author"),
-                        comment.get("url"),
-                        comment.get("created_utc"),
-                        scraped_at,
-                        scraped_at,
-                    ),
-                )
-                conn.execute(
-                    """
-                    INSERT INTO comment_snapshots (
-                        comment_reddit_id, scraped_at, score
-                    )
-                    VALUES (?, ?, ?)
-                    """,
-                    (comment_id, scraped_at, comment.get("score")),
+    Comments carry their ``post_reddit_id``. They don't mark their post's
+    comments as fetched, and comments whose post isn't stored are skipped.
+    Returns the number of posts, comments and skipped comments written.
+    """
+    scraped_at = _now_utc()
+    post_rows = []
+    post_snapshot_rows = []
+    for post in posts:
+        if post.get("reddit_id"):
+            post = dict(post, comments_fetched=False)
+            _build_post_rows(post, subreddit, scraped_at, post_rows, post_snapshot_rows)
+
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(_UPSERT_POST_SQL, post_rows)
+        conn.executemany(_EXTEND_POST_SNAPSHOT_SQL, post_snapshot_rows)
+        conn.executemany(_INSERT_POST_SNAPSHOT_SQL, post_snapshot_rows)
+        conn.executemany(_UPSERT_POST_LATEST_SQL, post_snapshot_rows)
+
+        _stage_ids(conn, sorted({c["post_reddit_id"] for c in comments}))
+        stored_post_ids = {
+            row["reddit_id"]
+            for row in conn.execute(
+                """
+                SELECT p.reddit_id
+                FROM temp.staged_ids s
+                JOIN posts p ON p.reddit_id = s.id
+                """
+            )
+        }
+        comment_rows = []
+        comment_snapshot_rows = []
+        for comment in comments:
+            if comment["post_reddit_id"] in stored_post_ids:
+                _build_comment_rows(
+                    comment["post_reddit_id"],
+                    [comment],
+                    scraped_at,
+                    comment_rows,
+                    comment_snapshot_rows,
                 )
+        conn.executemany(_UPSERT_COMMENT_SQL, comment_rows)
+        conn.executemany(_EXTEND_COMMENT_SNAPSHOT_SQL, comment_snapshot_rows)
+        conn.executemany(_INSERT_COMMENT_SNAPSHOT_SQL, comment_snapshot_rows)
+        conn.executemany(_UPSERT_COMMENT_LATEST_SQL, comment_snapshot_rows)
+
+        conn.executemany(
+            """
+            INSERT INTO stream_state (name, last_id, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                last_id = excluded.last_id,
+                updated_at = excluded.updated_at
+            """,
+            [(name, last_id, scraped_at) for name, last_id in cursors.items()],
+        )
+
+    return {
+        "posts": len(post_rows),
+        "comments": len(comment_rows),
+        "skipped_comments": len(comments) - len(comment_rows),
+    }
+
+
+def stream_cursors(names: list[str]) -> dict[str, str]:
+    """Return the last stored item id of each named ingest stream."""
+    if not names:
+        return {}
+    with _connect() as conn:
+        _stage_ids(conn, names)
+        rows = conn.execute(
+            """
+            SELECT st.name, st.last_id
+            FROM temp.staged_ids s
+            JOIN stream_state st ON st.name = s.id
+            """
+        ).fetchall()
+    return {row["name"]: row["last_id"] for row in rows}
+
+
+def start_scrape_run(listings: list[dict[str, Any]]) -> int:
+    """Record a new running scrape of ``listings`` and return its id."""
+    now = _now_utc()
+    with _connect() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO scrape_runs (listings, status, started_at, updated_at)
+            VALUES (?, 'running', ?, ?)
+            """,
+            (json.dumps(listings), now, now),
+        )
+    return int(cursor.lastrowid)
 
-    return load_posts([post["reddit_id"] for post in posts if post.get("reddit_id")])
+
+def set_scrape_run_status(run_id: int, status: str, error: str | None = None) -> None:
+    """Mark a scrape run ``running``, ``failed`` or ``completed``."""
+    with _connect() as conn:
+        conn.execute(
+            """
+            UPDATE scrape_runs
+            SET status = ?, error = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (status, error, _now_utc(), run_id),
+        )
+
+
+def save_scrape_progress(
+    run_id: int,
+    subreddit: str,
+    after: str | None = None,
+    fetched: int = 0,
+    done: bool = False,
+    comment_posts: dict[str, bool] | None = None,
+) -> None:
+    """Checkpoint a scrape run's listing of ``subreddit``.
+
+    ``fetched`` posts are added to the listing's count and ``after`` (the
+    last saved post's fullname) becomes where a resumed run continues.
+    ``comment_posts`` maps posts that still need comments to whether their
+    refresh is incremental.
+    """
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _save_scrape_progress(
+            conn, run_id, subreddit, after, fetched, done, comment_posts
+        )
+
+
+def _save_scrape_progress(
+    conn: sqlite3.Connection,
+    run_id: int,
+    subreddit: str,
+    after: str | None = None,
+    fetched: int = 0,
+    done: bool = False,
+    comment_posts: dict[str, bool] | None = None,
+) -> None:
+    conn.execute(
+        """
+        INSERT INTO scrape_run_listings (run_id, subreddit, after, fetched, done)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(run_id, subreddit) DO UPDATE SET
+            after = COALESCE(excluded.after, scrape_run_listings.after),
+            fetched = scrape_run_listings.fetched + excluded.fetched,
+            done = MAX(scrape_run_listings.done, excluded.done)
+        """,
+        (run_id, subreddit, after, fetched, int(done)),
+    )
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO scrape_run_posts (run_id, reddit_id, incremental)
+        VALUES (?, ?, ?)
+        """,
+        [
+            (run_id, post_id, int(incremental))
+            for post_id, incremental in (comment_posts or {}).items()
+        ],
+    )
+    conn.execute(
+        "UPDATE scrape_runs SET updated_at = ? WHERE id = ?", (_now_utc(), run_id)
+    )
+
+
+def latest_scrape_run() -> dict[str, Any] | None:
+    """Return the most recent scrape run with its progress, if any.
+
+    ``progress`` maps each subreddit to its listing's ``after``, ``fetched``
+    and ``done``; ``pending_comments`` maps posts whose comments were not
+    saved yet to whether their refresh is incremental.
+    """
+    with _connect() as conn:
+        run = conn.execute(
+            """
+            SELECT id, listings, status, started_at, updated_at, error
+            FROM scrape_runs
+            ORDER BY id DESC
+            LIMIT 1
+            """
+        ).fetchone()
+        if run is None:
+            return None
+        listings = conn.execute(
+            """
+            SELECT subreddit, after, fetched, done
+            FROM scrape_run_listings
+            WHERE run_id = ?
+            """,
+            (run["id"],),
+        ).fetchall()
+        pending = conn.execute(
+            """
+            SELECT reddit_id, incremental
+            FROM scrape_run_posts
+            WHERE run_id = ? AND comments_done = 0
+            """,
+            (run["id"],),
+        ).fetchall()
+
+    return {
+        **dict(run),
+        "listings": json.loads(run["listings"]),
+        "progress": {
+            row["subreddit"]: {
+                "after": row["after"],
+                "fetched": row["fetched"],
+                "done": bool(row["done"]),
+            }
+            for row in listings
+        },
+        "pending_comments": {
+            row["reddit_id"]: bool(row["incremental"]) for row in pending
+        },
+    }
+
+
+def _build_post_rows(
+    post: dict[str, Any],
+    subreddit: str,
+    scraped_at: str,
+    post_rows: list[tuple],
+    post_snapshot_rows: list[dict[str, Any]],
+) -> None:
+    """Append a post's row and snapshot row."""
+    post_id = post["reddit_id"]
+    # Posts whose comments were not re-fetched keep their stored
+    # comment freshness.
+    comments_fetched = post.get("comments_fetched", bool(post.get("comments")))
+    post_rows.append(
+        (
+            post_id,
+            subreddit,
+            post.get("title", ""),
+            post.get("selftext", ""),
+            post.get("url", ""),
+            post.get("author"),
+            post.get("created_utc"),
+            scraped_at,
+            scraped_at,
+            scraped_at if comments_fetched else None,
+            post.get("num_comments") if comments_fetched else None,
+        )
+    )
+    post_snapshot_rows.append(
+        {
+            "post_id": post_id,
+            "scraped_at": scraped_at,
+            "score": post.get("score"),
+            "upvote_ratio": post.get("upvote_ratio"),
+            "num_comments": post.get("num_comments"),
+            "is_pinned": int(bool(post.get("is_pinned", False))),
+        }
+    )
+
+
+def _build_comment_rows(
+    post_id: str,
+    comments: list[dict[str, Any]],
+    scraped_at: str,
+    comment_rows: list[tuple],
+    comment_snapshot_rows: list[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """Append a post's comment and snapshot rows; return its saved comments."""
+    saved_comments = []
+    for comment in comments:
+        if isinstance(comment, str):
+            continue
+
+        comment_id = comment.get("reddit_id")
+        if not comment_id:
+            continue
+
+        comment_rows.append(
+            (
+                comment_id,
+                post_id,
+                comment.get("body", ""),
+                comment.get("author"),
+                comment.get("url"),
+                comment.get("created_utc"),
+                scraped_at,
+                scraped_at,
+                comment.get("parent_id"),
+                comment.get("depth"),
+            )
+        )
+        comment_snapshot_rows.append(
+            {
+                "comment_id": comment_id,
+                "scraped_at": scraped_at,
+                "score": comment.get("score"),
+            }
+        )
+        saved_comments.append(
+            {
+                "reddit_id": comment_id,
+                "post_reddit_id": post_id,
+                "body": comment.get("body", ""),
+                "author": comment.get("author"),
+                "url": comment.get("url"),
+                "created_utc": comment.get("created_utc"),
+                "score": comment.get("score"),
+                "parent_id": comment.get("parent_id"),
+                "depth": comment.get("depth"),
+            }
+        )
+
+    saved_comments.sort(key=_comment_score_sort_key)
+    return saved_comments
 
 
 def load_posts(reddit_ids: list[str]) -> list[dict[str, Any]]:
     if not reddit_ids:
         return []
 
-    init_db()
-    placeholders = ",".join("?" for _ in reddit_ids)
     with _connect() as conn:
+        _stage_ids(conn, reddit_ids)
         post_rows = conn.execute(
-            f"""
+            """
             SELECT
                 p.reddit_id, p.title, p.selftext, p.url, p.author, p.created_utc,
                 p.first_scraped_at, p.last_scraped_at,
-                ps.score, ps.upvote_ratio, ps.num_comments, ps.is_pinned
-            FROM posts p
-            LEFT JOIN post_snapshots ps ON ps.id = (
-                SELECT id
-                FROM post_snapshots
-                WHERE post_reddit_id = p.reddit_id
-                ORDER BY scraped_at DESC, id DESC
-                LIMIT 1
-            )
-            WHERE p.reddit_id IN ({placeholders})
-            """,
-            reddit_ids,
+                pl.score, pl.upvote_ratio, pl.num_comments, pl.is_pinned
+            FROM temp.staged_ids s
+            JOIN posts p ON p.reddit_id = s.id
+            LEFT JOIN post_latest pl ON pl.post_reddit_id = p.reddit_id
+            """
         ).fetchall()
         posts_by_id = {row["reddit_id"]: dict(row) for row in post_rows}
 
-        comment_rows = conn.execute(
-            f"""
-            SELECT
-                c.reddit_id, c.post_reddit_id, c.body, c.author, c.url,
-                c.created_utc, cs.score
-            FROM comments c
-            LEFT JOIN comment_snapshots cs ON cs.id = (
-                SELECT id
-                FROM comment_snapshots
-                WHERE comment_reddit_id = c.reddit_id
-                ORDER BY scraped_at DESC, id DESC
-                LIMIT 1
-            )
-            WHERE c.post_reddit_id IN ({placeholders})
-            ORDER BY c.post_reddit_id, cs.score DESC
-            """,
-            reddit_ids,
-        ).fetchall()
+        comments_by_post = _stored_comments(conn, list(posts_by_id))
 
     for post in posts_by_id.values():
-        post["comments"] = []
+        post["comments"] = comments_by_post.get(post["reddit_id"], [])
         post["is_pinned"] = bool(post.get("is_pinned"))
 
-    for row in comment_rows:
-        post = posts_by_id.get(row["post_reddit_id"])
-        if post is not None:
-            post["comments"].append(dict(row))
-
     return [posts_by_id[reddit_id] for reddit_id in reddit_ids if reddit_id in posts_by_id]
 
 
 def load_recent_posts(subreddit: str, limit: int) -> list[dict[str, Any]]:
-    init_db()
     with _connect() as conn:
         rows = conn.execute(
             """
@@ -310,25 +1257,23 @@ def add_report_deltas(
     if not reddit_ids:
         return posts
 
-    placeholders = ",".join("?" for _ in reddit_ids)
-    init_db()
     with _connect() as conn:
+        _stage_ids(conn, reddit_ids)
         rows = conn.execute(
-            f"""
+            """
             SELECT
                 ps.post_reddit_id, ps.score, ps.upvote_ratio, ps.num_comments
-            FROM post_snapshots ps
-            WHERE ps.post_reddit_id IN ({placeholders})
-              AND ps.id = (
-                  SELECT id
-                  FROM post_snapshots
-                  WHERE post_reddit_id = ps.post_reddit_id
-                    AND scraped_at <= ?
-                  ORDER BY scraped_at DESC, id DESC
-                  LIMIT 1
-              )
+            FROM temp.staged_ids s
+            JOIN post_snapshots ps ON ps.id = (
+                SELECT id
+                FROM post_snapshots
+                WHERE post_reddit_id = s.id
+                  AND scraped_at <= ?
+                ORDER BY scraped_at DESC, id DESC
+                LIMIT 1
+            )
             """,
-            [*reddit_ids, previous_report_at],
+            (previous_report_at,),
         ).fetchall()
 
     previous_by_id = {row["post_reddit_id"]: dict(row) for row in rows}
@@ -352,7 +1297,6 @@ def add_report_deltas(
 
 
 def latest_report_generated_at(subreddit: str) -> str | None:
-    init_db()
     with _connect() as conn:
         row = conn.execute(
             """
@@ -368,60 +1312,237 @@ def latest_report_generated_at(subreddit: str) -> str | None:
     return row["generated_at"] if row else None
 
 
+def tracked_post_ids(
+    subreddit: str, hours: float, limit: int | None = None
+) -> list[str]:
+    """Return posts scraped within the last ``hours``, most recent first."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat(
+        timespec="seconds"
+    )
+    rows = (
+        _connect()
+        .execute(
+            """
+            SELECT reddit_id
+            FROM posts
+            WHERE subreddit = ? AND last_scraped_at >= ?
+            ORDER BY last_scraped_at DESC, reddit_id
+            LIMIT ?
+            """,
+            (subreddit, cutoff, -1 if limit is None else limit),
+        )
+        .fetchall()
+    )
+    return [row["reddit_id"] for row in rows]
+
+
 def existing_post_ids(reddit_ids: list[str]) -> set[str]:
     if not reddit_ids:
         return set()
 
-    init_db()
-    placeholders = ",".join("?" for _ in reddit_ids)
     with _connect() as conn:
+        _stage_ids(conn, reddit_ids)
         rows = conn.execute(
-            f"""
-            SELECT reddit_id
-            FROM posts
-            WHERE reddit_id IN ({placeholders})
-            """,
-            reddit_ids,
+            """
+            SELECT p.reddit_id
+            FROM temp.staged_ids s
+            JOIN posts p ON p.reddit_id = s.id
+            """
         ).fetchall()
 
     return {row["reddit_id"] for row in rows}
 
 
+def stored_comment_state(post_ids: list[str]) -> dict[str, dict[str, Any]]:
+    """Return each post's stored comment ids and newest comment time.
+
+    Posts without stored comments are left out.
+    """
+    if not post_ids:
+        return {}
+
+    with _connect() as conn:
+        _stage_ids(conn, post_ids)
+        rows = conn.execute(
+            """
+            SELECT c.post_reddit_id, c.reddit_id, c.created_utc
+            FROM temp.staged_ids s
+            JOIN comments c ON c.post_reddit_id = s.id
+            """
+        ).fetchall()
+
+    state: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        post_state = state.setdefault(
+            row["post_reddit_id"],
+            {"ids": set(), "newest_created_utc": None},
+        )
+        post_state["ids"].add(row["reddit_id"])
+        try:
+            created_utc = float(row["created_utc"])
+        except (TypeError, ValueError):
+            continue
+        if (
+            post_state["newest_created_utc"] is None
+            or created_utc > post_state["newest_created_utc"]
+        ):
+            post_state["newest_created_utc"] = created_utc
+    return state
+
+
+def stored_comment_counts(post_ids: list[str]) -> dict[str, int]:
+    """Return how many comments are stored for each post that has any."""
+    if not post_ids:
+        return {}
+
+    with _connect() as conn:
+        _stage_ids(conn, post_ids)
+        rows = conn.execute(
+            """
+            SELECT c.post_reddit_id, COUNT(*) AS comments
+            FROM temp.staged_ids s
+            JOIN comments c ON c.post_reddit_id = s.id
+            GROUP BY c.post_reddit_id
+            """
+        ).fetchall()
+
+    return {row["post_reddit_id"]: row["comments"] for row in rows}
+
+
 def posts_needing_comment_refresh(
-    reddit_ids: list[str], refresh_hours: int
+    reddit_ids: list[str],
+    refresh_hours: int,
+    num_comments: dict[str, int | None] | None = None,
+    require_growth: bool | None = None,
 ) -> set[str]:
+    """Return the posts whose stored comments should be re-fetched.
+
+    A post is stale when its comments were never fetched, or were fetched
+    more than ``refresh_hours`` ago. With ``require_growth`` a stale post is
+    only refreshed if its comment count grew since that fetch; current
+    counts come from ``num_comments`` when given, otherwise from the latest
+    stored snapshot.
+    """
     if not reddit_ids:
         return set()
+    if require_growth is None:
+        require_growth = config.COMMENT_REFRESH_REQUIRE_GROWTH
+    num_comments = num_comments or {}
 
     cutoff = (
         datetime.now(timezone.utc) - timedelta(hours=refresh_hours)
     ).isoformat(timespec="seconds")
-    placeholders = ",".join("?" for _ in reddit_ids)
-    init_db()
     with _connect() as conn:
+        _stage_ids(conn, reddit_ids)
         rows = conn.execute(
-            f"""
-            SELECT p.reddit_id
-            FROM posts p
-            LEFT JOIN (
-                SELECT post_reddit_id, MAX(last_scraped_at) AS comments_scraped_at
-                FROM comments
-                GROUP BY post_reddit_id
-            ) c ON c.post_reddit_id = p.reddit_id
-            WHERE p.reddit_id IN ({placeholders})
-              AND (
-                  c.comments_scraped_at IS NULL
-                  OR c.comments_scraped_at < ?
-              )
+            """
+            SELECT
+                p.reddit_id, p.comments_scraped_at, p.comments_seen_count,
+                pl.num_comments
+            FROM temp.staged_ids s
+            JOIN posts p ON p.reddit_id = s.id
+            LEFT JOIN post_latest pl ON pl.post_reddit_id = p.reddit_id
+            WHERE p.comments_scraped_at IS NULL
+               OR p.comments_scraped_at < ?
             """,
-            [*reddit_ids, cutoff],
+            (cutoff,),
         ).fetchall()
 
-    return {row["reddit_id"] for row in rows}
+    stale_ids = set()
+    for row in rows:
+        current_count = num_comments.get(row["reddit_id"], row["num_comments"])
+        if (
+            require_growth
+            and row["comments_scraped_at"] is not None
+            and row["comments_seen_count"] is not None
+            and current_count is not None
+            and current_count <= row["comments_seen_count"]
+        ):
+            continue
+        stale_ids.add(row["reddit_id"])
+    return stale_ids
+
+
+def post_activity(
+    reddit_ids: list[str], window_hours: float = 1.0
+) -> dict[str, dict[str, Any]]:
+    """Return each post's recent score and comment velocity, per hour.
+
+    Velocities compare the latest snapshot with the values the post had
+    ``window_hours`` earlier (or at its first snapshot, if later). Posts with
+    a single snapshot fall back to their average since creation. Each entry
+    also carries the post's latest ``score`` and ``num_comments``, its
+    ``created_utc``, ``last_snapshot_at`` and ``comments_scraped_at``.
+    """
+    if not reddit_ids:
+        return {}
+
+    with _connect() as conn:
+        _stage_ids(conn, reddit_ids)
+        rows = conn.execute(
+            """
+            SELECT
+                p.reddit_id, p.created_utc, p.comments_scraped_at,
+                pl.scraped_at AS last_snapshot_at,
+                pl.score AS latest_score,
+                pl.num_comments AS latest_num_comments,
+                ps.scraped_at, COALESCE(ps.valid_to, ps.scraped_at) AS valid_to,
+                ps.score, ps.num_comments
+            FROM temp.staged_ids s
+            JOIN posts p ON p.reddit_id = s.id
+            JOIN post_latest pl ON pl.post_reddit_id = p.reddit_id
+            JOIN post_snapshots ps ON ps.post_reddit_id = p.reddit_id
+            ORDER BY p.reddit_id, ps.scraped_at
+            """
+        ).fetchall()
+
+    activity: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        latest_at = datetime.fromisoformat(row["last_snapshot_at"])
+        window_start = latest_at - timedelta(hours=window_hours)
+        entry = activity.setdefault(
+            row["reddit_id"],
+            {
+                "created_utc": row["created_utc"],
+                "last_snapshot_at": row["last_snapshot_at"],
+                "comments_scraped_at": row["comments_scraped_at"],
+                "latest": (row["latest_score"], row["latest_num_comments"]),
+                "reference": None,
+            },
+        )
+        # The earliest run still valid at the start of the window.
+        if entry["reference"] is None and (
+            datetime.fromisoformat(row["valid_to"]) >= window_start
+        ):
+            since = max(datetime.fromisoformat(row["scraped_at"]), window_start)
+            entry["reference"] = (
+                row["score"],
+                row["num_comments"],
+                (latest_at - since).total_seconds() / 3600,
+            )
+
+    for entry in activity.values():
+        score, num_comments = entry.pop("latest")
+        entry["score"] = score
+        entry["num_comments"] = num_comments
+        ref_score, ref_comments, hours = entry.pop("reference") or (0, 0, 0)
+        if hours <= 0:
+            ref_score, ref_comments = 0, 0
+            hours = _hours_since_created(
+                entry["created_utc"], entry["last_snapshot_at"]
+            )
+        entry["score_per_hour"] = (
+            max(_number_delta(score, ref_score) or 0, 0) / hours if hours else None
+        )
+        entry["comments_per_hour"] = (
+            max(_number_delta(num_comments, ref_comments) or 0, 0) / hours
+            if hours
+            else None
+        )
+    return activity
 
 
 def save_report(markdown: str, report_date: str, subreddit: str) -> int:
-    init_db()
     with _connect() as conn:
         cursor = conn.execute(
             """
@@ -447,35 +1568,1115 @@ def save_report_news_items(report_id: int, items: list[dict[str, Any]]) -> None:
     if not report_id or not items:
         return
 
-    init_db()
     included_at = _now_utc()
     with _connect() as conn:
         for item in items:
             item_id = item.get("id")
             if not item_id:
                 continue
-            conn.execute(
+            # Items merged across queries are linked to every query that
+            # found them.
+            queries = item.get("matched_queries") or [item.get("query", "")]
+            conn.executemany(
                 """
                 INSERT OR IGNORE INTO report_news_items (
                     report_id, news_item_id, query, included_at
                 )
                 VALUES (?, ?, ?, ?)
                 """,
-                (report_id, item_id, item.get("query", ""), included_at),
+                [(report_id, item_id, query, included_at) for query in queries],
             )
 
 
+def cached_news_items(
+    provider: str, queries: list[str], max_age_hours: float
+) -> dict[str, list[dict[str, Any]]]:
+    """Return cached items for the queries fetched within ``max_age_hours``.
+
+    Queries missing from the result need fetching. A fresh query that found
+    nothing maps to an empty list.
+    """
+    if not queries:
+        return {}
+
+    cutoff = (
+        datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+    ).isoformat(timespec="seconds")
+    with _connect() as conn:
+        _stage_ids(conn, queries)
+        rows = conn.execute(
+            """
+            SELECT
+                f.query AS fetch_query, n.id, n.provider, n.query, n.title,
+                n.url, n.source_name, n.published_at, n.summary, n.fetched_at
+            FROM temp.staged_ids s
+            JOIN news_fetches f ON f.provider = ? AND f.query = s.id
+            LEFT JOIN news_items n
+                ON n.provider = f.provider
+               AND n.query = f.query
+               AND n.fetched_at = f.fetched_at
+            WHERE f.fetched_at >= ?
+            ORDER BY f.query, n.feed_rank
+            """,
+            (provider, cutoff),
+        ).fetchall()
+
+    cached = {}
+    for row in rows:
+        items = cached.setdefault(row["fetch_query"], [])
+        if row["id"] is not None:
+            item = dict(row)
+            del item["fetch_query"]
+            items.append(item)
+    return cached
+
+
+def news_validators(provider: str, queries: list[str]) -> dict[str, dict[str, str]]:
+    """Return the stored ETag/Last-Modified validators for cached queries."""
+    if not queries:
+        return {}
+
+    with _connect() as conn:
+        _stage_ids(conn, queries)
+        rows = conn.execute(
+            """
+            SELECT f.query, f.etag, f.last_modified
+            FROM temp.staged_ids s
+            JOIN news_fetches f ON f.provider = ? AND f.query = s.id
+            WHERE f.etag IS NOT NULL OR f.last_modified IS NOT NULL
+            """,
+            (provider,),
+        ).fetchall()
+    return {
+        row["query"]: {"etag": row["etag"], "last_modified": row["last_modified"]}
+        for row in rows
+    }
+
+
+def renew_news_items(
+    provider: str,
+    query: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> list[dict[str, Any]] | None:
+    """Mark a query's cached items fresh again after a 304 Not Modified.
+
+    Returns the cached items, or None if the query is no longer cached.
+    """
+    fetched_at = _now_utc()
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT fetched_at FROM news_fetches WHERE provider = ? AND query = ?",
+            (provider, query),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            """
+            UPDATE news_items
+            SET fetched_at = ?
+            WHERE provider = ? AND query = ? AND fetched_at = ?
+            """,
+            (fetched_at, provider, query, row["fetched_at"]),
+        )
+        conn.execute(
+            """
+            UPDATE news_fetches
+            SET fetched_at = ?,
+                etag = COALESCE(?, etag),
+                last_modified = COALESCE(?, last_modified)
+            WHERE provider = ? AND query = ?
+            """,
+            (fetched_at, etag, last_modified, provider, query),
+        )
+        rows = conn.execute(
+            """
+            SELECT
+                id, provider, query, title, url, source_name, published_at,
+                summary, fetched_at
+            FROM news_items
+            WHERE provider = ? AND query = ? AND fetched_at = ?
+            ORDER BY feed_rank
+            """,
+            (provider, query, fetched_at),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def save_news_items(
+    provider: str,
+    query: str,
+    items: list[dict[str, Any]],
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> list[dict[str, Any]]:
+    """Upsert one query's fetched items and mark the query as fresh.
+
+    Returns the items with their ``id`` set, in the order given.
+    """
+    fetched_at = _now_utc()
+    rows = [
+        {
+            "provider": provider,
+            "query": query,
+            "title": item.get("title", ""),
+            "url": item.get("url", ""),
+            "source_name": item.get("source_name"),
+            "published_at": item.get("published_at"),
+            "summary": item.get("summary"),
+            "fetched_at": fetched_at,
+            "raw": item.get("raw"),
+            "feed_rank": rank,
+        }
+        for rank, item in enumerate(items)
+    ]
+    with _connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO news_items (
+                provider, query, title, url, source_name, published_at,
+                summary, fetched_at, raw, feed_rank
+            )
+            VALUES (
+                :provider, :query, :title, :url, :source_name, :published_at,
+                :summary, :fetched_at, :raw, :feed_rank
+            )
+            ON CONFLICT(provider, query, url) DO UPDATE SET
+                title = excluded.title,
+                source_name = excluded.source_name,
+                published_at = excluded.published_at,
+                summary = excluded.summary,
+                fetched_at = excluded.fetched_at,
+                raw = excluded.raw,
+                feed_rank = excluded.feed_rank
+            """,
+            rows,
+        )
+        conn.execute(
+            """
+            INSERT INTO news_fetches (
+                provider, query, fetched_at, item_count, etag, last_modified
+            )
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(provider, query) DO UPDATE SET
+                fetched_at = excluded.fetched_at,
+                item_count = excluded.item_count,
+                etag = excluded.etag,
+                last_modified = excluded.last_modified
+            """,
+            (provider, query, fetched_at, len(rows), etag, last_modified),
+        )
+        ids = {
+            row["url"]: row["id"]
+            for row in conn.execute(
+                """
+                SELECT url, id
+                FROM news_items
+                WHERE provider = ? AND query = ? AND fetched_at = ?
+                """,
+                (provider, query, fetched_at),
+            )
+        }
+
+    saved = []
+    for row in rows:
+        item = dict(row, id=ids.get(row["url"]))
+        del item["feed_rank"]
+        saved.append(item)
+    return saved
+
+
+# External-content FTS5 tables: the text lives only in the source tables and the
+# triggers below keep the index in step with inserts, edits and deletes.
+_SEARCH_INDEXES = {
+    "posts_fts": ("posts", "rowid", ("title", "selftext")),
+    "comments_fts": ("comments", "rowid", ("body",)),
+    "reports_fts": ("reports", "id", ("markdown",)),
+}
+
+
+def search_text(
+    query: str,
+    kinds: tuple[str, ...] = ("posts", "comments", "reports"),
+    subreddit: str | None = None,
+    limit: int = 20,
+    raw_query: bool = False,
+) -> list[dict[str, Any]]:
+    """Full-text search over stored posts, comments and reports.
+
+    Results are ranked by bm25 (best first) and carry a snippet with matches
+    wrapped in ``[`` ``]``. Unless ``raw_query`` is set, each word of the
+    query is quoted so tickers and punctuation never hit FTS5 syntax.
+    """
+    match = query if raw_query else _fts_phrase_query(query)
+    if not match:
+        return []
+
+    conn = _connect()
+    if not _search_index_exists(conn):
+        raise RuntimeError(
+            "Full-text search index is missing. Run "
+            "'python -m wsbreporter.search --rebuild' (requires SQLite FTS5)."
+        )
+
+    queries = {
+        "posts": """
+            SELECT
+                'post' AS kind, p.reddit_id AS id, p.reddit_id AS post_reddit_id,
+                p.subreddit, p.title, p.author, p.created_utc, p.url,
+                snippet(posts_fts, -1, '[', ']', '...', 16) AS snippet,
+                bm25(posts_fts, 2.0, 1.0) AS rank
+            FROM posts_fts
+            JOIN posts p ON p.rowid = posts_fts.rowid
+            WHERE posts_fts MATCH :match
+              AND (:subreddit IS NULL OR p.subreddit = :subreddit)
+            ORDER BY rank
+            LIMIT :limit
+        """,
+        "comments": """
+            SELECT
+                'comment' AS kind, c.reddit_id AS id, c.post_reddit_id,
+                p.subreddit, p.title, c.author, c.created_utc, c.url,
+                snippet(comments_fts, 0, '[', ']', '...', 16) AS snippet,
+                bm25(comments_fts) AS rank
+            FROM comments_fts
+            JOIN comments c ON c.rowid = comments_fts.rowid
+            JOIN posts p ON p.reddit_id = c.post_reddit_id
+            WHERE comments_fts MATCH :match
+              AND (:subreddit IS NULL OR p.subreddit = :subreddit)
+            ORDER BY rank
+            LIMIT :limit
+        """,
+        "reports": """
+            SELECT
+                'report' AS kind, CAST(r.id AS TEXT) AS id,
+                NULL AS post_reddit_id, r.subreddit,
+                'Report ' || r.report_date AS title, r.llm_model AS author,
+                r.generated_at AS created_utc, NULL AS url,
+                snippet(reports_fts, 0, '[', ']', '...', 16) AS snippet,
+                bm25(reports_fts) AS rank
+            FROM reports_fts
+            JOIN reports r ON r.id = reports_fts.rowid
+            WHERE reports_fts MATCH :match
+              AND (:subreddit IS NULL OR r.subreddit = :subreddit)
+            ORDER BY rank
+            LIMIT :limit
+        """,
+    }
+    params = {"match": match, "subreddit": subreddit, "limit": limit}
+    results = []
+    for kind in kinds:
+        results.extend(dict(row) for row in conn.execute(queries[kind], params))
+    results.sort(key=lambda result: result["rank"])
+    return results[:limit]
+
+
+def rebuild_search_index() -> dict[str, int]:
+    """Create the FTS5 tables if needed and re-index every row."""
+    conn = _connect()
+    if not _fts5_available(conn):
+        raise RuntimeError("This SQLite build does not include FTS5.")
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _create_search_index(conn)
+        return _rebuild_search_index(conn)
+
+
+def _create_search_index(conn: sqlite3.Connection) -> None:
+    for fts_table, (source, key, columns) in _SEARCH_INDEXES.items():
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in columns)
+        _execute_script(
+            conn,
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                {column_list},
+                content='{source}',
+                content_rowid='{key}',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_after_insert
+            AFTER INSERT ON {source} BEGIN
+                INSERT INTO {fts_table} (rowid, {column_list})
+                VALUES (new.{key}, {new_values});
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_after_delete
+            AFTER DELETE ON {source} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+                VALUES ('delete', old.{key}, {old_values});
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_after_update
+            AFTER UPDATE OF {column_list} ON {source}
+            WHEN {changed} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+                VALUES ('delete', old.{key}, {old_values});
+                INSERT INTO {fts_table} (rowid, {column_list})
+                VALUES (new.{key}, {new_values});
+            END;
+            """,
+        )
+
+
+def _rebuild_search_index(conn: sqlite3.Connection) -> dict[str, int]:
+    counts = {}
+    for fts_table, (source, _, _) in _SEARCH_INDEXES.items():
+        conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+        counts[source] = conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+    return counts
+
+
+def _search_index_exists(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _fts5_available(conn: sqlite3.Connection) -> bool:
+    options = {row[0] for row in conn.execute("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in options
+
+
+def _fts_phrase_query(query: str) -> str:
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms if term.strip('"'))
+
+
+_EXTENDED_SNAPSHOT_RUN_QUERIES = {
+    "post_snapshots": """
+        SELECT ps.id AS snapshot_id, p.subreddit, ps.scraped_at, ps.valid_to
+        FROM post_snapshots ps
+        JOIN posts p ON p.reddit_id = ps.post_reddit_id
+        WHERE ps.valid_to >= ? AND ps.id <= ?
+        ORDER BY ps.id
+    """,
+    "comment_snapshots": """
+        SELECT cs.id AS snapshot_id, p.subreddit, cs.scraped_at, cs.valid_to
+        FROM comment_snapshots cs
+        JOIN comments c ON c.reddit_id = cs.comment_reddit_id
+        JOIN posts p ON p.reddit_id = c.post_reddit_id
+        WHERE cs.valid_to >= ? AND cs.id <= ?
+        ORDER BY cs.id
+    """,
+}
+_SNAPSHOT_EXPORT_QUERIES = {
+    "post_snapshots": """
+        SELECT
+            ps.id AS snapshot_id, ps.post_reddit_id, p.subreddit,
+            ps.scraped_at, ps.valid_to, ps.score, ps.upvote_ratio,
+            ps.num_comments, ps.is_pinned, p.title, p.author, p.created_utc
+        FROM post_snapshots ps
+        JOIN posts p ON p.reddit_id = ps.post_reddit_id
+        WHERE ps.id > ?
+        ORDER BY ps.id
+        LIMIT ?
+    """,
+    "comment_snapshots": """
+        SELECT
+            cs.id AS snapshot_id, cs.comment_reddit_id, c.post_reddit_id,
+            p.subreddit, cs.scraped_at, cs.valid_to, cs.score, c.author,
+            c.created_utc
+        FROM comment_snapshots cs
+        JOIN comments c ON c.reddit_id = cs.comment_reddit_id
+        JOIN posts p ON p.reddit_id = c.post_reddit_id
+        WHERE cs.id > ?
+        ORDER BY cs.id
+        LIMIT ?
+    """,
+}
+
+
+def iter_snapshot_batches(table: str, after_id: int = 0, batch_rows: int = 50_000):
+    """Yield snapshot rows joined with post/comment metadata, in id order.
+
+    Each batch is a list of at most ``batch_rows`` dicts, read with keyset
+    pagination so memory stays bounded however large the table is.
+    """
+    query = _SNAPSHOT_EXPORT_QUERIES[table]
+    conn = _connect()
+    while True:
+        rows = conn.execute(query, (after_id, batch_rows)).fetchall()
+        if not rows:
+            return
+        after_id = rows[-1]["snapshot_id"]
+        yield [dict(row) for row in rows]
+
+
+def export_watermark(name: str) -> int:
+    row = (
+        _connect()
+        .execute("SELECT last_id FROM export_state WHERE name = ?", (name,))
+        .fetchone()
+    )
+    return row["last_id"] if row else 0
+
+
+def export_watermark_time(name: str) -> str | None:
+    """Return when the named export last read the database, if ever."""
+    row = (
+        _connect()
+        .execute("SELECT exported_at FROM export_state WHERE name = ?", (name,))
+        .fetchone()
+    )
+    return row["exported_at"] if row else None
+
+
+def set_export_watermark(
+    name: str, last_id: int, exported_at: str | None = None
+) -> None:
+    with _connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO export_state (name, last_id, exported_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                last_id = excluded.last_id,
+                exported_at = excluded.exported_at
+            """,
+            (name, last_id, exported_at or _now_utc()),
+        )
+
+
+def extended_snapshot_runs(
+    table: str, up_to_id: int, since: str
+) -> list[dict[str, Any]]:
+    """Return already-exported snapshot runs whose valid_to moved since ``since``.
+
+    Any run can have been extended, including ones a newer run has since
+    replaced, so this reads every run whose ``valid_to`` is at or after
+    ``since`` through the valid_to index. Rows hold ``snapshot_id``,
+    ``subreddit``, ``scraped_at`` and the new ``valid_to``.
+    """
+    rows = (
+        _connect()
+        .execute(_EXTENDED_SNAPSHOT_RUN_QUERIES[table], (since, up_to_id))
+        .fetchall()
+    )
+    return [dict(row) for row in rows]
+
+
+def rebuild_latest_snapshots() -> tuple[int, int]:
+    """Recompute post_latest/comment_latest from the full snapshot history."""
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return _rebuild_latest_snapshots(conn)
+
+
+def compact_snapshots(vacuum: bool = True) -> dict[str, int]:
+    """Collapse consecutive identical snapshots into run-length rows.
+
+    Databases written before change-only snapshots have one row per scrape.
+    Each run of unchanged values keeps its first row, with valid_to set to the
+    last scrape of the run, so as-of lookups return the same values.
+    """
+    conn = _connect()
+    bytes_before = _database_size(conn)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        post_rows_removed = _compact_snapshot_table(
+            conn,
+            "post_snapshots",
+            "post_reddit_id",
+            ("score", "upvote_ratio", "num_comments", "is_pinned"),
+        )
+        comment_rows_removed = _compact_snapshot_table(
+            conn, "comment_snapshots", "comment_reddit_id", ("score",)
+        )
+        _rebuild_latest_snapshots(conn)
+
+    if vacuum:
+        conn.execute("VACUUM")
+
+    return {
+        "post_rows_removed": post_rows_removed,
+        "comment_rows_removed": comment_rows_removed,
+        "bytes_before": bytes_before,
+        "bytes_after": _database_size(conn),
+        "bytes_free": _free_bytes(conn),
+    }
+
+
+# Snapshot tables that can be downsampled: rollup table, entity key column and
+# the value columns summarized as first/last/min/max per bucket.
+_SNAPSHOT_ROLLUPS = {
+    "post_snapshots": (
+        "post_snapshot_rollups",
+        "post_reddit_id",
+        ("score", "num_comments", "upvote_ratio"),
+    ),
+    "comment_snapshots": ("comment_snapshot_rollups", "comment_reddit_id", ("score",)),
+}
+
+
+def downsample_snapshots(
+    raw_retention_days: int | None = None,
+    hourly_retention_days: int | None = None,
+    batch_hours: int | None = None,
+) -> dict[str, int]:
+    """Roll old snapshots into hourly, then daily, rollup rows.
+
+    Snapshots older than the raw window are summarized per hour and thinned
+    to the first and last row of each hour; hourly rollups older than the
+    hourly window are merged per day and the snapshots thinned the same way
+    per day. Rows that a stored report's as-of lookup resolves to are kept,
+    so report deltas do not change. Rollup ``samples`` count scrapes, not
+    rows; buckets that lose no rows get no rollup.
+
+    Work is committed in batches of ``batch_hours`` of history so the write
+    lock is only held briefly. Progress is tracked in snapshot_rollup_state,
+    so an interrupted run resumes where it stopped.
+    """
+    if raw_retention_days is None:
+        raw_retention_days = config.SNAPSHOT_RAW_RETENTION_DAYS
+    if hourly_retention_days is None:
+        hourly_retention_days = config.SNAPSHOT_HOURLY_RETENTION_DAYS
+    if batch_hours is None:
+        batch_hours = config.SNAPSHOT_COMPACTION_BATCH_HOURS
+    hourly_retention_days = max(hourly_retention_days, raw_retention_days)
+
+    now = datetime.now(timezone.utc)
+    hour_cutoff = (now - timedelta(days=raw_retention_days)).replace(
+        minute=0, second=0, microsecond=0
+    )
+    day_cutoff = (now - timedelta(days=hourly_retention_days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+    conn = _connect()
+    stats = {}
+    for table in _SNAPSHOT_ROLLUPS:
+        rows_removed = 0
+        for resolution, cutoff in (("hour", hour_cutoff), ("day", day_cutoff)):
+            step = timedelta(hours=batch_hours)
+            if resolution == "day":
+                step = timedelta(days=max(1, batch_hours // 24))
+            for start, end in _rollup_batches(conn, table, resolution, cutoff, step):
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    rows_removed += _rollup_snapshot_batch(
+                        conn, table, resolution, start, end
+                    )
+                    conn.execute(
+                        """
+                        INSERT INTO snapshot_rollup_state (name, rolled_up_to)
+                        VALUES (?, ?)
+                        ON CONFLICT(name) DO UPDATE SET
+                            rolled_up_to = excluded.rolled_up_to
+                        """,
+                        (f"{table}:{resolution}", end),
+                    )
+        stats[f"{table}_rows_removed"] = rows_removed
+    return stats
+
+
+def run_maintenance(
+    raw_retention_days: int | None = None,
+    hourly_retention_days: int | None = None,
+    batch_hours: int | None = None,
+    vacuum_pages: int = 1000,
+) -> dict[str, int]:
+    """Downsample old snapshots, refresh planner stats and reclaim free pages.
+
+    Free pages can only be returned to the filesystem when the database uses
+    auto_vacuum=INCREMENTAL; otherwise they stay in the file (reported as
+    ``bytes_free``) and are reused by later writes until a full VACUUM.
+    """
+    conn = _connect()
+    bytes_before = _database_size(conn)
+    stats = downsample_snapshots(
+        raw_retention_days=raw_retention_days,
+        hourly_retention_days=hourly_retention_days,
+        batch_hours=batch_hours,
+    )
+    conn.execute("ANALYZE")
+
+    # incremental_vacuum is a no-op unless the file uses auto_vacuum=INCREMENTAL.
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+
+    stats["bytes_before"] = bytes_before
+    stats["bytes_after"] = _database_size(conn)
+    stats["bytes_free"] = _free_bytes(conn)
+    return stats
+
+
+def _rollup_batches(
+    conn: sqlite3.Connection,
+    table: str,
+    resolution: str,
+    cutoff: datetime,
+    step: timedelta,
+):
+    """Yield [start, end) ISO timestamp windows that still need rolling up."""
+    rollup_table = _SNAPSHOT_ROLLUPS[table][0]
+    row = conn.execute(
+        "SELECT rolled_up_to FROM snapshot_rollup_state WHERE name = ?",
+        (f"{table}:{resolution}",),
+    ).fetchone()
+    if row:
+        start = datetime.fromisoformat(row["rolled_up_to"])
+    elif resolution == "hour":
+        first = conn.execute(f"SELECT MIN(scraped_at) FROM {table}").fetchone()[0]
+        if first is None:
+            return
+        start = datetime.fromisoformat(first).replace(
+            minute=0, second=0, microsecond=0
+        )
+    else:
+        # Hours that lost no rows to thinning have no hourly rollup, only raw rows.
+        first = conn.execute(
+            f"""
+            SELECT MIN(first_at)
+            FROM (
+                SELECT MIN(bucket_start) AS first_at
+                FROM {rollup_table}
+                WHERE resolution = 'hour'
+                UNION ALL
+                SELECT MIN(scraped_at) FROM {table}
+            )
+            """
+        ).fetchone()[0]
+        if first is None:
+            return
+        start = datetime.fromisoformat(first).replace(hour=0, minute=0, second=0)
+
+    if resolution == "day":
+        # Never merge hours that have not been rolled up yet.
+        hour_row = conn.execute(
+            "SELECT rolled_up_to FROM snapshot_rollup_state WHERE name = ?",
+            (f"{table}:hour",),
+        ).fetchone()
+        if hour_row is None:
+            return
+        hour_done = datetime.fromisoformat(hour_row["rolled_up_to"])
+        cutoff = min(cutoff, hour_done.replace(hour=0, minute=0, second=0))
+
+    while start < cutoff:
+        end = min(start + step, cutoff)
+        yield start.isoformat(timespec="seconds"), end.isoformat(timespec="seconds")
+        start = end
+
+
+def _rollup_snapshot_batch(
+    conn: sqlite3.Connection, table: str, resolution: str, start: str, end: str
+) -> int:
+    rollup_table, key, value_columns = _SNAPSHOT_ROLLUPS[table]
+    aggregates = ("first", "last", "min", "max")
+    summary_columns = [
+        f"{aggregate}_{column}" for column in value_columns for aggregate in aggregates
+    ]
+    # Raw snapshots read as one-row summaries of their own run.
+    raw_summary = ", ".join(
+        f"{column} AS {aggregate}_{column}"
+        for column in value_columns
+        for aggregate in aggregates
+    )
+    raw_source = f"""
+        SELECT
+            {key}, {raw_summary}, id, 0 AS is_rollup,
+            scraped_at AS first_seen,
+            COALESCE(valid_to, scraped_at) AS last_seen,
+            scrapes AS samples,
+            substr(scraped_at, 1, 13) || ':00:00+00:00' AS hour
+        FROM {table}
+        WHERE scraped_at >= :start AND scraped_at < :end
+    """
+    if resolution == "hour":
+        source = f"SELECT *, hour AS bucket FROM ({raw_source})"
+    else:
+        # Hours that were thinned have an hourly rollup covering their
+        # remaining raw rows; hours that weren't only have raw rows.
+        source = f"""
+            SELECT
+                {key}, {", ".join(summary_columns)}, rowid AS id, 1 AS is_rollup,
+                first_scraped_at AS first_seen,
+                last_scraped_at AS last_seen,
+                samples,
+                bucket_start AS hour,
+                substr(bucket_start, 1, 10) || 'T00:00:00+00:00' AS bucket
+            FROM {rollup_table}
+            WHERE resolution = 'hour'
+              AND bucket_start >= :start AND bucket_start < :end
+            UNION ALL
+            SELECT raw.*, substr(raw.hour, 1, 10) || 'T00:00:00+00:00' AS bucket
+            FROM ({raw_source}) AS raw
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM {rollup_table} r
+                WHERE r.{key} = raw.{key}
+                  AND r.resolution = 'hour'
+                  AND r.bucket_start = raw.hour
+            )
+        """
+
+    selected = []
+    for name in summary_columns:
+        aggregate = name.split("_", 1)[0]
+        if aggregate in ("first", "last"):
+            selected.append(f"MAX(CASE WHEN rn_{aggregate} = 1 THEN {name} END)")
+        else:
+            selected.append(f"{aggregate.upper()}({name})")
+
+    # Thinning keeps the first and last raw run of a bucket, so buckets with
+    # two runs or fewer lose nothing and get no rollup row.
+    conn.execute(
+        f"""
+        INSERT INTO {rollup_table} (
+            {key}, resolution, bucket_start, first_scraped_at, last_scraped_at,
+            samples, {", ".join(summary_columns)}
+        )
+        SELECT
+            {key}, :resolution, bucket, MIN(first_seen), MAX(last_seen),
+            SUM(samples), {", ".join(selected)}
+        FROM (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY {key}, bucket ORDER BY first_seen, id
+                ) AS rn_first,
+                ROW_NUMBER() OVER (
+                    PARTITION BY {key}, bucket ORDER BY last_seen DESC, id DESC
+                ) AS rn_last
+            FROM ({source})
+        )
+        GROUP BY {key}, bucket
+        HAVING COUNT(*) > 2 OR MAX(is_rollup) = 1
+        """,
+        {"start": start, "end": end, "resolution": resolution},
+    )
+    if resolution == "day":
+        conn.execute(
+            f"""
+            DELETE FROM {rollup_table}
+            WHERE resolution = 'hour'
+              AND bucket_start >= :start AND bucket_start < :end
+            """,
+            {"start": start, "end": end},
+        )
+
+    # Keep the first and last snapshot of each bucket so as-of lookups still
+    # resolve inside it, and every snapshot a stored report resolved to so
+    # report deltas come out the same after thinning.
+    kept_for_reports = "0"
+    if table == "post_snapshots":
+        kept_for_reports = """
+            EXISTS (
+                SELECT 1
+                FROM posts p
+                JOIN reports r ON r.subreddit = p.subreddit
+                WHERE p.reddit_id = ranked.post_reddit_id
+                  AND r.generated_at >= ranked.scraped_at
+                  AND r.generated_at < COALESCE(ranked.next_scraped_at, :end)
+            )
+        """
+    bucket_length = 13 if resolution == "hour" else 10
+    return conn.execute(
+        f"""
+        DELETE FROM {table}
+        WHERE id IN (
+            SELECT id
+            FROM (
+                SELECT
+                    id,
+                    {key},
+                    scraped_at,
+                    LEAD(scraped_at) OVER (
+                        PARTITION BY {key} ORDER BY scraped_at, id
+                    ) AS next_scraped_at,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY {key}, substr(scraped_at, 1, {bucket_length})
+                        ORDER BY scraped_at, id
+                    ) AS rn_first,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY {key}, substr(scraped_at, 1, {bucket_length})
+                        ORDER BY scraped_at DESC, id DESC
+                    ) AS rn_last
+                FROM {table}
+                WHERE scraped_at >= :start AND scraped_at < :end
+            ) AS ranked
+            WHERE rn_first > 1 AND rn_last > 1 AND NOT {kept_for_reports}
+        )
+        """,
+        {"start": start, "end": end},
+    ).rowcount
+
+
+def _compact_snapshot_table(
+    conn: sqlite3.Connection, table: str, key: str, value_columns: tuple[str, ...]
+) -> int:
+    same_as_previous = " AND ".join(
+        f"LAG({column}) OVER w IS {column}" for column in value_columns
+    )
+    conn.execute("DROP TABLE IF EXISTS temp.snapshot_runs")
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE snapshot_runs AS
+        WITH ordered AS (
+            SELECT
+                id, {key}, scraped_at, scrapes,
+                COALESCE(valid_to, scraped_at) AS seen_to,
+                CASE
+                    WHEN LAG(id) OVER w IS NOT NULL AND {same_as_previous} THEN 0
+                    ELSE 1
+                END AS starts_run
+            FROM {table}
+            WINDOW w AS (PARTITION BY {key} ORDER BY scraped_at, id)
+        ),
+        numbered AS (
+            SELECT
+                *,
+                SUM(starts_run) OVER (
+                    PARTITION BY {key} ORDER BY scraped_at, id
+                ) AS run_no
+            FROM ordered
+        )
+        SELECT
+            id,
+            seen_to,
+            scrapes,
+            FIRST_VALUE(id) OVER (
+                PARTITION BY {key}, run_no ORDER BY scraped_at, id
+            ) AS keep_id
+        FROM numbered
+        """
+    )
+    removed = conn.execute(
+        f"""
+        DELETE FROM {table}
+        WHERE id IN (SELECT id FROM snapshot_runs WHERE id != keep_id)
+        """
+    ).rowcount
+    conn.execute(
+        f"""
+        UPDATE {table}
+        SET valid_to = runs.valid_to, scrapes = runs.scrapes
+        FROM (
+            SELECT keep_id, MAX(seen_to) AS valid_to, SUM(scrapes) AS scrapes
+            FROM snapshot_runs
+            GROUP BY keep_id
+        ) AS runs
+        WHERE {table}.id = runs.keep_id
+        """
+    )
+    conn.execute("DROP TABLE temp.snapshot_runs")
+    return removed
+
+
+def _rebuild_latest_snapshots(conn: sqlite3.Connection) -> tuple[int, int]:
+    conn.execute("DELETE FROM post_latest")
+    post_count = conn.execute(
+        """
+        INSERT INTO post_latest (
+            post_reddit_id, scraped_at, valid_from, score, upvote_ratio,
+            num_comments, is_pinned
+        )
+        SELECT
+            post_reddit_id, COALESCE(valid_to, scraped_at), scraped_at, score,
+            upvote_ratio, num_comments, is_pinned
+        FROM (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY post_reddit_id
+                    ORDER BY scraped_at DESC, id DESC
+                ) AS rn
+            FROM post_snapshots
+        )
+        WHERE rn = 1
+        """
+    ).rowcount
+
+    conn.execute("DELETE FROM comment_latest")
+    comment_count = conn.execute(
+        """
+        INSERT INTO comment_latest (
+            comment_reddit_id, scraped_at, valid_from, score
+        )
+        SELECT comment_reddit_id, COALESCE(valid_to, scraped_at), scraped_at, score
+        FROM (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY comment_reddit_id
+                    ORDER BY scraped_at DESC, id DESC
+                ) AS rn
+            FROM comment_snapshots
+        )
+        WHERE rn = 1
+        """
+    ).rowcount
+    return post_count, comment_count
+
+
+def _ensure_column(
+    conn: sqlite3.Connection, table: str, column: str, declaration: str
+) -> bool:
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    return True
+
+
+def _database_size(conn: sqlite3.Connection) -> int:
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def _free_bytes(conn: sqlite3.Connection) -> int:
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return free_pages * page_size
+
+
+def _print_size_change(stats: dict[str, int]) -> None:
+    change = stats["bytes_after"] - stats["bytes_before"]
+    if change > 0:
+        summary = f"grew by {change:,} bytes"
+    else:
+        summary = f"{-change:,} bytes reclaimed"
+    print(
+        f"Database size: {stats['bytes_before']:,} -> {stats['bytes_after']:,} "
+        f"bytes ({summary})."
+    )
+    if stats["bytes_free"]:
+        print(
+            f"{stats['bytes_free']:,} bytes of free pages stay in the file "
+            "until VACUUM."
+        )
+
+
+def _first_scraped_at(
+    conn: sqlite3.Connection, reddit_ids: list[str]
+) -> dict[str, str]:
+    _stage_ids(conn, reddit_ids)
+    rows = conn.execute(
+        """
+        SELECT p.reddit_id, p.first_scraped_at
+        FROM temp.staged_ids s
+        JOIN posts p ON p.reddit_id = s.id
+        """
+    ).fetchall()
+    return {row["reddit_id"]: row["first_scraped_at"] for row in rows}
+
+
+def _stored_comments(
+    conn: sqlite3.Connection, post_ids: list[str]
+) -> dict[str, list[dict[str, Any]]]:
+    _stage_ids(conn, post_ids)
+    rows = conn.execute(
+        """
+        SELECT
+            c.reddit_id, c.post_reddit_id, c.body, c.author, c.url,
+            c.created_utc, cl.score, c.parent_id, c.depth
+        FROM temp.staged_ids s
+        JOIN comments c ON c.post_reddit_id = s.id
+        LEFT JOIN comment_latest cl ON cl.comment_reddit_id = c.reddit_id
+        ORDER BY c.post_reddit_id, cl.score DESC
+        """
+    ).fetchall()
+
+    comments_by_post: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        comments_by_post.setdefault(row["post_reddit_id"], []).append(dict(row))
+    return comments_by_post
+
+
+def _stage_ids(conn: sqlite3.Connection, ids: list[str]) -> None:
+    """Load ids into temp.staged_ids for the next query to join against.
+
+    Joining a temp table avoids SQLite's host-parameter limit on IN (...)
+    lists and gives every lookup the same query plan regardless of size.
+    The table is per connection, so each thread has its own.
+    """
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS staged_ids (id TEXT PRIMARY KEY)"
+    )
+    conn.execute("DELETE FROM temp.staged_ids")
+    conn.executemany(
+        "INSERT OR IGNORE INTO temp.staged_ids (id) VALUES (?)",
+        ((value,) for value in ids),
+    )
+
+
+def _comment_score_sort_key(comment: dict[str, Any]) -> tuple[bool, int | float]:
+    score = comment.get("score")
+    return (score is None, -(score or 0))
+
+
 def _connect() -> sqlite3.Connection:
+    """Return this thread's long-lived connection, opening it on first use.
+
+    Each thread gets its own connection so a scrape and a report running in
+    the same process never share a cursor. Pending schema migrations are
+    checked once per database path per process.
+    """
     db_path = _database_path()
+    if getattr(_local, "generation", None) != _generation:
+        _local.connections = {}
+        _local.generation = _generation
+
+    conn = _local.connections.get(db_path)
+    if conn is not None:
+        return conn
+
+    conn = _open_connection(db_path)
+    _local.connections[db_path] = conn
+    with _connections_lock:
+        _open_connections.append(conn)
+        if db_path not in _initialized_paths:
+            _migrate(conn)
+            _initialized_paths.add(db_path)
+    return conn
+
+
+def _close_thread_connections() -> None:
+    """Close the calling thread's connections, e.g. before the thread exits."""
+    with _connections_lock:
+        for conn in getattr(_local, "connections", {}).values():
+            conn.close()
+            if conn in _open_connections:
+                _open_connections.remove(conn)
+    _local.connections = {}
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
     db_dir = os.path.dirname(db_path)
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(
+        db_path,
+        timeout=config.DATABASE_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+    )
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    _apply_pragmas(conn)
     return conn
 
 
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    # auto_vacuum only takes effect on a brand-new file, so it must be set
+    # before WAL writes the header. Older files keep their mode until a VACUUM.
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # WAL lets a report read while a scrape is writing; NORMAL sync is durable
+    # across application crashes and only risks the last commit on power loss.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(config.DATABASE_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.DATABASE_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size = {-int(config.DATABASE_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+
+
 def _database_path() -> str:
     if os.path.isabs(config.DATABASE_PATH):
         return config.DATABASE_PATH
@@ -490,5 +2691,102 @@ def _number_delta(current: Any, previous: Any) -> int | float | None:
     return current - previous
 
 
+def _hours_since_created(created_utc: Any, at: str) -> float:
+    try:
+        created_at = datetime.fromtimestamp(float(created_utc), timezone.utc)
+    except (TypeError, ValueError):
+        return 0.0
+    return max((datetime.fromisoformat(at) - created_at).total_seconds() / 3600, 0.0)
+
+
 def _now_utc() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the wsbreporter database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrations", help="Show applied and pending migrations")
+    subparsers.add_parser("migrate", help="Apply pending schema migrations")
+    subparsers.add_parser(
+        "rebuild-latest",
+        help="Recompute the latest-snapshot tables from snapshot history",
+    )
+    maintain_parser = subparsers.add_parser(
+        "maintain",
+        help="Downsample old snapshots, then ANALYZE and incrementally vacuum",
+    )
+    maintain_parser.add_argument(
+        "--raw-days",
+        type=int,
+        default=config.SNAPSHOT_RAW_RETENTION_DAYS,
+        help="Keep every snapshot for this many days "
+        f"(default: {config.SNAPSHOT_RAW_RETENTION_DAYS})",
+    )
+    maintain_parser.add_argument(
+        "--hourly-days",
+        type=int,
+        default=config.SNAPSHOT_HOURLY_RETENTION_DAYS,
+        help="Keep hourly resolution for this many days, daily after that "
+        f"(default: {config.SNAPSHOT_HOURLY_RETENTION_DAYS})",
+    )
+    maintain_parser.add_argument(
+        "--batch-hours",
+        type=int,
+        default=config.SNAPSHOT_COMPACTION_BATCH_HOURS,
+        help="Hours of history to roll up per transaction "
+        f"(default: {config.SNAPSHOT_COMPACTION_BATCH_HOURS})",
+    )
+    compact_parser = subparsers.add_parser(
+        "compact-snapshots",
+        help="Collapse repeated snapshot rows into run-length intervals",
+    )
+    compact_parser.add_argument(
+        "--no-vacuum",
+        action="store_true",
+        help="Skip VACUUM after compaction (freed pages stay in the file)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "migrations":
+        current, latest = schema_version()
+        print(f"Schema version: {current} (latest: {latest})")
+        for version, description, _ in _MIGRATIONS:
+            status = "applied" if version <= current else "pending"
+            print(f"  {version:>3} {status:<8} {description}")
+    elif args.command == "migrate":
+        applied = migrate()
+        if not applied:
+            print("Database schema is up to date.")
+        for version, description in applied:
+            print(f"Applied migration {version}: {description}")
+    elif args.command == "rebuild-latest":
+        post_count, comment_count = rebuild_latest_snapshots()
+        print(
+            f"Rebuilt latest snapshots for {post_count} posts "
+            f"and {comment_count} comments."
+        )
+    elif args.command == "maintain":
+        stats = run_maintenance(
+            raw_retention_days=args.raw_days,
+            hourly_retention_days=args.hourly_days,
+            batch_hours=args.batch_hours,
+        )
+        print(
+            f"Removed {stats['post_snapshots_rows_removed']} post snapshot rows and "
+            f"{stats['comment_snapshots_rows_removed']} comment snapshot rows."
+        )
+        _print_size_change(stats)
+    elif args.command == "compact-snapshots":
+        stats = compact_snapshots(vacuum=not args.no_vacuum)
+        print(
+            f"Removed {stats['post_rows_removed']} post snapshot rows and "
+            f"{stats['comment_rows_removed']} comment snapshot rows."
+        )
+        _print_size_change(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Ingest a subreddit's new posts and comments as they are made.
+
+One reader thread per stream (new submissions, new comments) puts items on a
+bounded queue. When the writer falls behind, the queue fills and the readers
+block instead of buffering without limit. The writer stores a batch every
+STREAM_BATCH_SIZE items or STREAM_FLUSH_SECONDS, together with the newest id
+of each stream, so a restart resumes where the last stored batch ended. Run
+from the project root:
+
+    uv run python -m wsbreporter.stream
+"""
+
+import queue
+import threading
+import time
+from typing import Any
+
+from . import config
+from . import reddit
+from . import storage
+
+STREAM_KINDS = ("submissions", "comments")
+# Flushes a comment waits for its post to become fetchable before it is
+# dropped and the comments cursor may move past it.
+STREAM_RETRY_FLUSHES = 3
+
+
+def ingest(subreddit: str | None = None, seconds: float | None = None) -> dict:
+    """Stream ``subreddit`` into SQLite until interrupted or ``seconds`` pass."""
+    subreddit = subreddit or config.SUBREDDIT_NAME
+    names = {kind: _cursor_name(subreddit, kind) for kind in STREAM_KINDS}
+    cursors = storage.stream_cursors(list(names.values()))
+    for kind in STREAM_KINDS:
+        cursor = cursors.get(names[kind])
+        print(
+            f"Streaming {kind} from r/{subreddit}"
+            + (f", resuming after {cursor}" if cursor else "")
+            + "..."
+        )
+
+    items: queue.Queue = queue.Queue(maxsize=config.STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+    stats: dict[str, Any] = {
+        "started": time.monotonic(),
+        "items": 0,
+        "posts": 0,
+        "comments": 0,
+        "skipped_comments": 0,
+        "flushes": 0,
+        "blocked_seconds": dict.fromkeys(STREAM_KINDS, 0.0),
+    }
+    for kind in STREAM_KINDS:
+        threading.Thread(
+            target=_read_stream,
+            args=(kind, subreddit, cursors.get(names[kind]), items, stop, stats),
+            name=f"stream-{kind}",
+            daemon=True,
+        ).start()
+
+    batch = []
+    held: dict[str, tuple[dict, int]] = {}
+    flush_at = time.monotonic() + config.STREAM_FLUSH_SECONDS
+    stop_at = time.monotonic() + seconds if seconds else None
+    try:
+        while stop_at is None or time.monotonic() < stop_at:
+            timeout = flush_at - time.monotonic()
+            if stop_at is not None:
+                timeout = min(timeout, stop_at - time.monotonic())
+            try:
+                batch.append(items.get(timeout=max(timeout, 0)))
+            except queue.Empty:
+                pass
+            if len(batch) >= config.STREAM_BATCH_SIZE or time.monotonic() >= flush_at:
+                _flush(subreddit, batch, items, stats, held)
+                batch = []
+                flush_at = time.monotonic() + config.STREAM_FLUSH_SECONDS
+    except KeyboardInterrupt:
+        print("Stopping.")
+    finally:
+        stop.set()
+        while True:
+            try:
+                batch.append(items.get_nowait())
+            except queue.Empty:
+                break
+        _flush(subreddit, batch, items, stats, held)
+
+    elapsed = time.monotonic() - stats["started"]
+    print(
+        f"Ingested {stats['items']} items ({stats['posts']} posts, "
+        f"{stats['comments']} comments) in {elapsed:.0f}s "
+        f"({stats['items'] / max(elapsed, 1e-9):.1f} items/s) over "
+        f"{stats['flushes']} writes."
+    )
+    return stats
+
+
+def _read_stream(
+    kind: str,
+    subreddit: str,
+    cursor: str | None,
+    items: queue.Queue,
+    stop: threading.Event,
+    stats: dict[str, Any],
+) -> None:
+    try:
+        for item in reddit.stream_subreddit(kind, subreddit, cursor):
+            if stop.is_set():
+                return
+            if item is None:
+                stop.wait(config.STREAM_POLL_SECONDS)
+                continue
+            started = time.monotonic()
+            while not stop.is_set():
+                try:
+                    items.put((kind, item), timeout=1)
+                    break
+                except queue.Full:
+                    continue
+            stats["blocked_seconds"][kind] += time.monotonic() - started
+    except Exception as e:
+        print(f"Error: the {kind} stream stopped: {e}")
+
+
+def _flush(
+    subreddit: str,
+    batch: list[tuple[str, dict]],
+    items: queue.Queue,
+    stats: dict[str, Any],
+    held: dict[str, tuple[dict, int]],
+) -> None:
+    """Store a batch, retrying comments whose post could not be fetched.
+
+    ``held`` maps such comments' fullnames to the comment and how many
+    flushes it has tried; it is updated in place. The comments cursor stays
+    before the oldest held comment, so a restart reads it again.
+    """
+    retried = [("comments", comment) for comment, _ in held.values()]
+    attempts = {name: tries for name, (_, tries) in held.items()}
+    held.clear()
+    # Held comments are older than anything in the new batch.
+    batch = retried + batch
+    if not batch:
+        return
+    started = time.monotonic()
+    posts = [item for kind, item in batch if kind == "submissions"]
+    comments = [item for kind, item in batch if kind == "comments"]
+
+    # Comments on posts that were never stored need their post saved first.
+    missing = {c["post_reddit_id"] for c in comments} - {p["reddit_id"] for p in posts}
+    missing -= storage.existing_post_ids(sorted(missing))
+    fetched = (reddit.fetch_post_snapshots(sorted(missing)) or []) if missing else []
+    posts += fetched
+    unavailable = missing - {post["reddit_id"] for post in fetched}
+
+    dropped = 0
+    for comment in comments:
+        if comment["post_reddit_id"] in unavailable:
+            tries = attempts.get(comment["fullname"], 0) + 1
+            if tries < STREAM_RETRY_FLUSHES:
+                held[comment["fullname"]] = (comment, tries)
+            else:
+                dropped += 1
+
+    # Each stream's items arrive oldest first, so its cursor advances to the
+    # newest item, but never past a held comment.
+    cursors = {}
+    blocked = set()
+    for kind, item in batch:
+        name = _cursor_name(subreddit, kind)
+        if item["fullname"] in held:
+            blocked.add(name)
+        if name not in blocked:
+            cursors[name] = item["fullname"]
+
+    saved = storage.save_stream_batch(subreddit, posts, comments, cursors)
+    now = time.time()
+    lags = [now - float(item["created_utc"]) for _, item in batch]
+    elapsed = time.monotonic() - stats["started"]
+    stats["items"] += len(batch) - len(retried)
+    stats["flushes"] += 1
+    for key in ("posts", "comments"):
+        stats[key] += saved[key]
+    stats["skipped_comments"] += dropped
+    blocked_seconds = sum(stats["blocked_seconds"].values())
+    print(
+        f"Stored {saved['posts']} posts and {saved['comments']} comments "
+        f"in {time.monotonic() - started:.2f}s; "
+        f"lag mean {sum(lags) / len(lags):.0f}s, max {max(lags):.0f}s; "
+        f"{stats['items'] / max(elapsed, 1e-9):.1f} items/s; "
+        f"queue {items.qsize()}/{config.STREAM_QUEUE_SIZE}, "
+        f"readers blocked {blocked_seconds:.1f}s"
+        + (
+            f"; holding {len(held)} comments until their posts can be fetched"
+            if held
+            else ""
+        )
+        + (
+            f"; dropped {dropped} comments whose posts could not be fetched"
+            if dropped
+            else ""
+        )
+        + "."
+    )
+
+
+def _cursor_name(subreddit: str, kind: str) -> str:
+    return f"{subreddit}:{kind}"
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Stream a subreddit's new posts and comments into SQLite"
+    )
+    parser.add_argument(
+        "-s",
+        "--subreddit",
+        type=str,
+        default=config.SUBREDDIT_NAME,
+        help=f"Subreddit to stream (default: {config.SUBREDDIT_NAME})",
+    )
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        help="Stop after this many seconds (default: run until interrupted)",
+    )
+    args = parser.parse_args()
+
+    if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET:
+        print("Error: Please set your Reddit API keys in .env before scraping.")
+        return
+
+    ingest(subreddit=args.subreddit, seconds=args.seconds)
+    reddit.print_rate_limit_metrics()
+    storage.close_db()
+
+
+if __name__ == "__main__":
+    main()